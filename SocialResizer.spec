@@ -37,3 +37,49 @@ exe = EXE(
     entitlements_file=None,
     icon=['assets\\social_resizer.ico'],
 )
+
+# Headless CLI (batch/watch/bench): a console build without Tkinter, and a
+# one-folder layout so each run starts straight from disk instead of first
+# unpacking a one-file archive into a temp folder.
+cli = Analysis(
+    ['social_resizer_cli.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=['social_resizer_batch', 'social_resizer_watch', 'social_resizer_queue', 'social_resizer_bench'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['tkinter', '_tkinter', 'social_resizer_gui'],
+    noarchive=False,
+    optimize=0,
+)
+cli_pyz = PYZ(cli.pure)
+
+cli_exe = EXE(
+    cli_pyz,
+    cli.scripts,
+    [],
+    exclude_binaries=True,
+    name='socialresizer-cli',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    cli_exe,
+    cli.binaries,
+    cli.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='socialresizer-cli',
+)
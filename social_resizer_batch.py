@@ -0,0 +1,541 @@
+"""
+SocialResizer — headless batch engine.
+Process whole folders (or glob patterns) without the GUI, spreading the
+(image × size) work over a pool of worker processes. Each file is reported
+as succeeded or failed; one broken file never aborts the run.
+
+Usage:
+    python social_resizer_batch.py photos/ -o output --preset "All Platforms"
+    python social_resizer_batch.py "shots/*.jpg" -o out --size instagram_post --workers 8
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+from social_resizer_metrics import JsonLinesExporter, StageMetrics, write_prometheus_textfile
+
+from social_resizer_core import FORMATS, PNG_PROFILES, open_source, resize_for_platforms
+from social_resizer_crop import CROP_METHODS
+from social_resizer_registry import JobPlan, Registry, default_registry
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+SMALL_SOURCE_PIXELS = 1 << 20   # sources up to this size are grouped into chunks
+CHUNK_FILES = 64                # max small sources per worker task
+
+# ------------------------
+# Results
+# ------------------------
+@dataclass
+class FileResult:
+    input_file: str
+    outputs: list = field(default_factory=list)
+    cached: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    duplicate_of: str = None        # outputs reused from this source (dedupe)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+@dataclass
+class BatchReport:
+    results: list = field(default_factory=list)
+    elapsed: float = 0.0
+    duplicates: list = field(default_factory=list)   # social_resizer_dedupe.Duplicate
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+# ------------------------
+# Input / selection helpers
+# ------------------------
+def collect_inputs(source: str, recursive: bool = False):
+    """Expand a file, directory or glob pattern into a sorted list of image paths."""
+    if os.path.isfile(source):
+        return [source]
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*") if recursive else os.path.join(source, "*")
+    else:
+        pattern = source
+    files = [
+        p for p in glob.glob(pattern, recursive=recursive)
+        if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTS)
+    ]
+    return sorted(files)
+
+def parse_bytes(text: str) -> int:
+    """'512M', '2G', '1.5GiB' or a plain byte count -> bytes (binary units)."""
+    units = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    t = text.strip().upper().removesuffix("IB").removesuffix("B")
+    suffix = t[-1:] if t[-1:] in units else ""
+    try:
+        value = float(t[:len(t) - len(suffix)])
+    except ValueError:
+        raise ValueError(f"Invalid size: {text}") from None
+    if value <= 0:
+        raise ValueError(f"Invalid size: {text}")
+    return int(value * units[suffix])
+
+def resolve_selection(presets=(), sizes=(), registry=None):
+    """
+    Build a selection list (label, (key, (W,H))) from preset names and size
+    labels/keys, keeping registry order and dropping duplicates.
+    """
+    return (registry or Registry()).resolve_selection(presets, sizes)
+
+# ------------------------
+# Worker side
+# ------------------------
+def _run_task(input_file, output_dir, selection, options, with_metrics=False, **io):
+    """
+    Process one task in a worker process; never raises.
+    Returns (input_file, saved paths, error or None, (events, peak_rss) or None).
+    `io` may carry prefetched `source` bytes and an AsyncWriter `writer`.
+    """
+    metrics = StageMetrics(keep_events=True) if with_metrics else None
+    try:
+        saved = resize_for_platforms(
+            input_file=input_file,
+            output_dir=output_dir,
+            selection=selection,
+            logger=lambda msg: None,
+            metrics=metrics,
+            **options,
+            **io
+        )
+        error = None
+    except Exception as e:
+        saved, error = [], f"{type(e).__name__}: {e}"
+    payload = (metrics.events, metrics.peak_rss) if metrics is not None else None
+    return input_file, saved, error, payload
+
+def _run_chunk(files, output_dir, selection, options, with_metrics=False, pipeline=None):
+    """
+    Process many small sources in one worker task: with options["threads"] > 1
+    whole files (decode, resample, encode) run in parallel instead of the few
+    sizes of each file. Returns one _run_task outcome per file, in order.
+    pipeline=(prefetch depth, writer threads) overlaps I/O instead (see _run_pipelined).
+    """
+    if pipeline:
+        return _run_pipelined(files, output_dir, selection, options, with_metrics, *pipeline)
+    threads = max(1, options.get("threads", 1))
+    per_file = dict(options, threads=1)
+    if threads == 1 or len(files) == 1:
+        return [_run_task(f, output_dir, selection, per_file, with_metrics) for f in files]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(threads, len(files))) as pool:
+        return list(pool.map(lambda f: _run_task(f, output_dir, selection, per_file, with_metrics), files))
+
+def _run_pipelined(files, output_dir, selection, options, with_metrics, depth, writers):
+    """
+    Process files in order on this thread while the next `depth` sources are
+    read and finished outputs are written (atomically) by `writers` threads.
+    An output whose write failed turns its source into a failure.
+    """
+    from social_resizer_io import AsyncWriter, prefetch
+    sources = prefetch(files, depth) if depth else ((f, None) for f in files)
+    writer = AsyncWriter(max_workers=writers) if writers else None
+    outcomes = []
+    try:
+        for f, data in sources:
+            io = {"writer": writer}
+            if data is not None:
+                try:
+                    io["source"] = data.result()
+                except OSError as e:
+                    outcomes.append((f, [], f"{type(e).__name__}: {e}", None))
+                    continue
+            outcomes.append(_run_task(f, output_dir, selection, options, with_metrics, **io))
+    finally:
+        failed = writer.close() if writer is not None else {}
+    if not failed:
+        return outcomes
+    result = []
+    for f, saved, error, payload in outcomes:
+        lost = [path for path in saved if path in failed]
+        if lost:
+            saved = [path for path in saved if path not in failed]
+            error = error or f"Write failed: {lost[0]} ({failed[lost[0]]})"
+        result.append((f, saved, error, payload))
+    return result
+
+def _source_pixels(path):
+    """Pixel count from the image header (None when unreadable)."""
+    try:
+        with open_source(path) as img:
+            return img.width * img.height
+    except Exception:
+        return None
+
+def _plan_chunks(pending, workers, max_pixels=SMALL_SOURCE_PIXELS):
+    """
+    Split {file: selection} into chunks of small sources sharing a selection,
+    enough of them to keep every worker busy. Returns (chunks, remaining).
+    max_pixels=None chunks every file without reading its header.
+    """
+    groups, remaining = {}, {}
+    for f, sel in pending.items():
+        pixels = _source_pixels(f) if max_pixels else 0
+        if pixels is not None and (not max_pixels or pixels <= max_pixels):
+            groups.setdefault(tuple(entry[1][0] for entry in sel), []).append((f, sel))
+        else:
+            remaining[f] = sel
+    chunks = []
+    for members in groups.values():
+        size = max(1, min(CHUNK_FILES, -(-len(members) // (workers * 4))))
+        for i in range(0, len(members), size):
+            part = members[i:i + size]
+            chunks.append(([f for f, _ in part], part[0][1]))
+    return chunks, remaining
+
+def _plan_tasks(files, selection, split_sizes):
+    if split_sizes:
+        return [(f, [entry]) for f in files for entry in selection]
+    return [(f, list(selection)) for f in files if selection]
+
+def _filter_cached(files, plan, cache, results):
+    """
+    Check every planned output against the cache in the parent process.
+    Returns ({file: stale selection}, {output path: (key, digest)}).
+    """
+    params = plan.cache_params()
+    selection = list(plan.selection)
+    pending, keys = {}, {}
+    for f in files:
+        try:
+            digest = cache.source_digest(f)
+        except OSError as e:
+            results[f].errors.append(f"{type(e).__name__}: {e}")
+            continue
+        stale = set()
+        for platform_key, size, ext, path in plan.output_paths(f):
+            key = cache.output_key(digest, platform_key, size, ext, params)
+            keys[path] = (key, digest)
+            if cache.is_fresh(path, key):
+                results[f].cached.append(path)
+            else:
+                stale.add(platform_key)
+        if stale:
+            pending[f] = [entry for entry in selection if entry[1][0] in stale]
+    return pending, keys
+
+def run_batch(
+    inputs,
+    output_dir=None,
+    selection=None,
+    workers=None,                 # default: os.cpu_count()
+    split_sizes=None,             # None = auto (split when fewer files than workers)
+    logger=None,
+    cache=None,                   # OutputCache: skip unchanged outputs, record new ones
+    metrics=None,                 # StageMetrics: receives every worker's stage events
+    chunk_small=None,             # None = auto (when there are many more files than workers)
+    prefetch=0,                   # sources read ahead per worker (pipelined I/O)
+    writers=0,                    # background writer threads per worker (pipelined I/O)
+    plan=None,                    # JobPlan: replaces output_dir, selection and options
+    dedupe=None,                  # "exact" or "perceptual": render one source per duplicate group
+    dedupe_link="hard",           # how duplicates get their outputs: "hard" link or "copy"
+    **options                     # any resize_for_platforms keyword (mode, export_fmt, ...)
+):
+    """
+    Run resize_for_platforms over many inputs on a process pool.
+    Returns a BatchReport with one FileResult per input file.
+    """
+    def log(msg):
+        (logger or print)(msg)
+
+    if plan is None:
+        plan = JobPlan.build(output_dir, selection, options)
+    output_dir, selection, options = plan.output_dir, list(plan.selection), dict(plan.options)
+    files = list(inputs)
+    results = {f: FileResult(f) for f in files}
+    start = time.perf_counter()
+
+    render, duplicates = files, []
+    if dedupe:
+        from social_resizer_dedupe import find_duplicates
+        digest = {"digest": cache.source_digest} if cache is not None else {}
+        if metrics is not None:
+            with metrics.stage("dedupe", files=len(files)) as info:
+                render, duplicates = find_duplicates(files, dedupe == "perceptual", logger=log, **digest)
+                info["duplicates"] = len(duplicates)
+        else:
+            render, duplicates = find_duplicates(files, dedupe == "perceptual", logger=log, **digest)
+
+    if cache is not None:
+        pending, keys = _filter_cached(render, plan, cache, results)
+    else:
+        pending, keys = {f: list(selection) for f in render}, {}
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    if chunk_small is None:
+        chunk_small = len(pending) >= workers * CHUNK_FILES
+    chunks = []
+    pipeline = (prefetch, writers) if prefetch or writers else None
+    if pipeline:  # every file goes through a pipelined chunk
+        chunks, pending = _plan_chunks(pending, workers, max_pixels=None)
+    elif chunk_small:
+        chunks, pending = _plan_chunks(pending, workers)
+    if len(pending) == 1 and not chunks and workers > 1:
+        # one source: render its sizes on threads in this process, which
+        # starts far faster than a worker pool (same output bytes)
+        options["threads"] = max(options.get("threads", 1), min(workers, len(selection)))
+        workers = 1
+    if split_sizes is None:
+        split_sizes = len(pending) < workers and len(selection) > 1
+    tasks = [task for f, sel in pending.items() for task in _plan_tasks([f], sel, split_sizes)]
+
+    def collect(outcome):
+        _collect(results, outcome, log)
+        input_file, saved, _, payload = outcome
+        if metrics is not None and payload is not None:
+            metrics.replay(*payload)
+        if cache is not None:
+            for path in saved:
+                key, digest = keys[path]
+                cache.record(path, key, input_file, digest)
+
+    with_metrics = metrics is not None
+    if workers == 1 or len(tasks) + len(chunks) <= 1:
+        for chunk, sel in chunks:
+            for outcome in _run_chunk(chunk, output_dir, sel, options, with_metrics, pipeline):
+                collect(outcome)
+        for f, sel in tasks:
+            collect(_run_task(f, output_dir, sel, options, with_metrics))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks) + len(chunks))) as pool:
+            futures = [pool.submit(_run_chunk, chunk, output_dir, sel, options, with_metrics, pipeline)
+                       for chunk, sel in chunks]
+            futures += [pool.submit(_run_task, f, output_dir, sel, options, with_metrics)
+                        for f, sel in tasks]
+            for fut in as_completed(futures):
+                outcome = fut.result()
+                for o in outcome if isinstance(outcome, list) else [outcome]:
+                    collect(o)
+    if duplicates:
+        _reuse_duplicates(duplicates, plan, results, dedupe_link, log)
+    if cache is not None:
+        cache.save()
+
+    report = BatchReport(results=[results[f] for f in files], elapsed=time.perf_counter() - start,
+                         duplicates=duplicates)
+    cached = sum(len(r.cached) for r in report.results)
+    reused = sum(results[d.source].ok for d in duplicates)
+    reused = f", {reused} duplicates reused" if duplicates else ""
+    log(f"Done: {len(report.succeeded)} ok, {len(report.failed)} failed, "
+        f"{cached} outputs up to date{reused} in {report.elapsed:.1f}s")
+    return report
+
+def _reuse_duplicates(duplicates, plan, results, mode, log):
+    """Give every duplicate its original's outputs (linked or copied) under its own names."""
+    from social_resizer_dedupe import reuse_outputs
+    for dup in duplicates:
+        res = results[dup.source]
+        res.duplicate_of = dup.original
+        if not results[dup.original].ok:
+            res.errors.append(f"Duplicate of failed source: {dup.original}")
+            log(f"Failed: {dup.source} (duplicate of failed source {dup.original})")
+            continue
+        try:
+            res.outputs = reuse_outputs(dup, plan, mode)
+        except OSError as e:
+            res.errors.append(f"{type(e).__name__}: {e}")
+            log(f"Failed: {dup.source} ({type(e).__name__}: {e})")
+            continue
+        log(f"Deduped: {dup.source} = {dup.original} ({dup.kind}, {len(res.outputs)} outputs reused)")
+
+def _collect(results, outcome, log):
+    input_file, saved, error, _ = outcome
+    res = results[input_file]
+    res.outputs.extend(saved)
+    if error:
+        res.errors.append(error)
+        log(f"Failed: {input_file} ({error})")
+    else:
+        for path in saved:
+            log(f"Saved: {path}")
+
+# ------------------------
+# CLI
+# ------------------------
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog="social_resizer_batch",
+        description="Batch-create social-ready images without the GUI."
+    )
+    p.add_argument("source", nargs="?", help="Image file, directory or glob pattern")
+    p.add_argument("-o", "--output", default="output", help="Output folder")
+    p.add_argument("-r", "--recursive", action="store_true", help="Recurse into subfolders")
+    p.add_argument("-p", "--preset", action="append", default=[], help="Preset name (repeatable)")
+    p.add_argument("-s", "--size", action="append", default=[], help="Size label or key (repeatable)")
+    add_export_arguments(p)
+    p.add_argument("--no-pyramid", action="store_true", help="Resample every size from full resolution")
+    p.add_argument("--no-draft", action="store_true", help="Always decode sources at full resolution")
+    p.add_argument("--no-color-management", action="store_true",
+                   help="Ignore embedded ICC profiles (plain conversion instead of a transform to sRGB)")
+    p.add_argument("--strict", action="store_true",
+                   help="Resample every cover size from the source (never derive one size from another)")
+    p.add_argument("--cache", nargs="?", const="", default=None, metavar="MANIFEST",
+                   help="Skip outputs whose source and settings are unchanged "
+                        "(manifest defaults to <output>/.socialresizer-cache.json)")
+    p.add_argument("--force", action="store_true", help="With --cache: re-render everything")
+    p.add_argument("--prune", action="store_true", help="With --cache: drop stale manifest entries")
+    p.add_argument("--dedupe", nargs="?", const="exact", choices=["exact", "perceptual"], default=None,
+                   help="Render one source per group of duplicates and reuse its outputs for the rest: "
+                        "exact (identical bytes, the default) or perceptual (also re-saves)")
+    p.add_argument("--dedupe-link", choices=["hard", "copy"], default="hard",
+                   help="Reuse outputs as hard links (default; copies across filesystems) or copies")
+    p.add_argument("--dedupe-report", metavar="PATH", help="Write the duplicates found as JSON")
+    p.add_argument("--threads", type=int, default=1, help="Threads per image for per-size encoding")
+    p.add_argument("--memory-budget", metavar="SIZE",
+                   help="Peak memory per worker process, e.g. 1G (lowers --threads as needed; "
+                        "sources that cannot fit fail)")
+    p.add_argument("--prefetch", type=int, default=0, metavar="N",
+                   help="Read N sources ahead per worker (for slow or network storage)")
+    p.add_argument("--writers", type=int, default=0, metavar="N",
+                   help="Write outputs on N background threads per worker, renamed into place when complete")
+    p.add_argument("--metrics-jsonl", metavar="PATH", help="Append per-stage events as JSON lines")
+    p.add_argument("--metrics-prom", metavar="PATH", help="Write stage totals as a Prometheus textfile")
+    p.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    p.add_argument("--list-presets", action="store_true", help="List presets and sizes, then exit")
+    return p
+
+def add_export_arguments(p):
+    """--registry and the export settings (shared with the watch and queue CLIs)."""
+    p.add_argument("--registry", metavar="PATH",
+                   help="JSON/TOML file with extra sizes, presets and preset export settings "
+                        "(default: $SOCIALRESIZER_REGISTRY)")
+    # Export settings default to the preset's settings, then to the built-in defaults
+    p.add_argument("--mode", choices=["cover", "contain"], default=None, help="Default: cover")
+    p.add_argument("--crop", choices=list(CROP_METHODS), default=None,
+                   help="Cover crop placement: center (default), or edges/entropy/faces to follow the content")
+    p.add_argument("--pad", action="store_true", default=None, help="Pad to exact size (contain only)")
+    p.add_argument("--transparent", action="store_true", default=None, help="Transparent pad (PNG, WebP, AVIF)")
+    p.add_argument("--bg", default=None, help="Letterbox color (hex, default #FFFFFF)")
+    add_format_arguments(p)
+    p.add_argument("--quality", type=int, default=None, help="JPEG quality (default 95)")
+    p.add_argument("--png-profile", choices=list(PNG_PROFILES), default=None,
+                   help="PNG compression: fast, balanced or smallest (default)")
+    p.add_argument("--png-palette", action="store_true", default=None,
+                   help="Palette PNG for letterboxed outputs (lossy)")
+
+def add_format_arguments(p):
+    """--format plus per-format quality/effort flags."""
+    p.add_argument("--format", default=None,
+                   help="JPEG (default), PNG, Both, WEBP, AVIF or a set such as JPEG+WEBP+AVIF")
+    for fmt in ("WEBP", "AVIF"):
+        _, _, quality, effort = FORMATS[fmt]
+        top = 6 if fmt == "WEBP" else 10
+        p.add_argument(f"--{fmt.lower()}-quality", type=int, default=None, metavar="Q",
+                       help=f"{fmt} quality (default {quality})")
+        p.add_argument(f"--{fmt.lower()}-effort", type=int, default=None, metavar="N",
+                       help=f"{fmt} encoder effort 0-{top}, higher is smaller and slower (default {effort})")
+
+def export_options(args):
+    """Export settings given on the command line (None = not given)."""
+    format_options = {}
+    for fmt in ("WEBP", "AVIF"):
+        for name in ("quality", "effort"):
+            value = getattr(args, f"{fmt.lower()}_{name}")
+            if value is not None:
+                format_options.setdefault(fmt, {})[name] = value
+    return dict(
+        mode=args.mode, crop=args.crop, pad_exact=args.pad, transparent_pad=args.transparent, bg_hex=args.bg,
+        export_fmt=args.format, quality=args.quality,
+        png_profile=args.png_profile, png_palette=args.png_palette,
+        format_options=format_options or None,
+    )
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        registry = default_registry(args.registry)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Registry: {e}\n")
+        return 2
+
+    if args.list_presets:
+        for name, labels in registry.presets.items():
+            if labels:
+                settings = registry.settings.get(name)
+                print(f"{name}  {settings}" if settings else name)
+        print()
+        for label, (key, _) in registry.sizes.items():
+            print(f"{key:24} {label}")
+        return 0
+
+    if not args.source:
+        sys.stderr.write("Missing source (file, directory or glob).\n")
+        return 2
+    try:
+        memory_budget = parse_bytes(args.memory_budget) if args.memory_budget else None
+        plan = registry.compile(
+            args.output, args.preset, args.size, **export_options(args),
+            pyramid=not args.no_pyramid, draft=not args.no_draft, strict=args.strict,
+            color_manage=not args.no_color_management,
+            threads=args.threads, memory_budget=memory_budget,
+        )
+    except ValueError as e:
+        sys.stderr.write(f"{e}\n")
+        return 2
+    if not plan.selection:
+        sys.stderr.write("Select at least one size with --preset or --size.\n")
+        return 2
+
+    files = collect_inputs(args.source, recursive=args.recursive)
+    if not files:
+        sys.stderr.write(f"No images found: {args.source}\n")
+        return 2
+
+    cache = None
+    if args.cache is not None:
+        from social_resizer_cache import MANIFEST_NAME, OutputCache
+        manifest = args.cache or os.path.join(args.output, MANIFEST_NAME)
+        cache = OutputCache(manifest, force=args.force)
+        if args.prune:
+            print(f"Pruned {cache.prune()} stale cache entries")
+
+    metrics, exporter = None, None
+    if args.metrics_jsonl or args.metrics_prom:
+        exporter = JsonLinesExporter(args.metrics_jsonl) if args.metrics_jsonl else None
+        metrics = StageMetrics(sinks=[exporter] if exporter else [])
+
+    report = run_batch(
+        files,
+        plan=plan,
+        workers=args.workers,
+        cache=cache,
+        metrics=metrics,
+        prefetch=args.prefetch,
+        writers=args.writers,
+        dedupe=args.dedupe,
+        dedupe_link=args.dedupe_link,
+    )
+    if args.dedupe_report:
+        import json
+        from social_resizer_dedupe import report_dict
+        outputs = {r.input_file: r.outputs for r in report.results if r.duplicate_of}
+        with open(args.dedupe_report, "w", encoding="utf-8") as f:
+            json.dump(report_dict(report.duplicates, outputs), f, indent=1)
+    if metrics is not None:
+        print(metrics.summary())
+        if exporter is not None:
+            exporter.close()
+        if args.metrics_prom:
+            write_prometheus_textfile(metrics, args.metrics_prom)
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
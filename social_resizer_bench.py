@@ -0,0 +1,440 @@
+"""
+SocialResizer — benchmark suite for the resize/export pipeline.
+Generates deterministic synthetic sources (several resolutions, aspect ratios
+and pixel modes), times every stage of the pipeline per (source, size, resize
+mode), rolls the stages up into every preset in PRESETS for each export
+format, runs resize_for_platforms end to end and times a cold start of the
+CLI (fresh process through the first output). Results are written as
+JSON and can be compared against a stored baseline.
+
+Usage:
+    python social_resizer_bench.py --save bench/baseline.json
+    python social_resizer_bench.py --compare bench/baseline.json --threshold 0.15
+    python social_resizer_bench.py --quick
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image
+
+from social_resizer_core import (
+    PNG_PROFILES, PRESETS, SIZES, ResamplePlan, contain_resize, cover_resize, decode_source,
+    flatten_if_needed, letterbox_canvas, open_source, plan_conversion, reduce_factor, resize_for_platforms,
+)
+from social_resizer_metrics import StageMetrics
+
+BENCH_VERSION = 2
+
+# Source formats per pixel mode (what such files usually arrive as)
+SOURCE_FORMATS = {
+    "RGB": ("JPEG", "jpg"),
+    "RGBA": ("PNG", "png"),
+    "P": ("PNG", "png"),
+    "CMYK": ("TIFF", "tif"),
+    "I;16": ("PNG", "png"),
+}
+
+RESIZE_VARIANTS = {
+    "cover": dict(mode="cover"),
+    "contain": dict(mode="contain"),
+    "contain_pad": dict(mode="contain", pad_exact=True),
+    "contain_pad_alpha": dict(mode="contain", pad_exact=True, transparent_pad=True),
+}
+
+EXPORT_FORMATS = ("JPEG", "PNG")
+BG_RGB = (255, 255, 255)
+QUALITY = 95
+
+# ------------------------
+# Synthetic sources
+# ------------------------
+def parse_aspect(text: str):
+    w, h = text.split(":")
+    return int(w), int(h)
+
+def source_size(megapixels: float, aspect):
+    """(w, h) with the given aspect ratio and roughly the given pixel count."""
+    aw, ah = aspect
+    h = int(round((megapixels * 1e6 * ah / aw) ** 0.5))
+    return max(1, int(round(h * aw / ah))), max(1, h)
+
+def synthetic_image(size, mode="RGB") -> Image.Image:
+    """Deterministic test image with gradients and fine fractal detail."""
+    r = Image.linear_gradient("L").resize(size)
+    g = Image.radial_gradient("L").resize(size)
+    b = Image.effect_mandelbrot(size, (-2.2, -1.3, 0.8, 1.3), 64)
+    rgb = Image.merge("RGB", (r, g, b))
+    if mode == "RGB":
+        return rgb
+    if mode == "RGBA":
+        rgba = rgb.convert("RGBA")
+        rgba.putalpha(Image.radial_gradient("L").resize(size).point(lambda v: 255 - v))
+        return rgba
+    if mode == "P":
+        return rgb.quantize(256)
+    if mode == "CMYK":
+        return rgb.convert("CMYK")
+    if mode == "I;16":
+        return b.convert("I").point(lambda v: v * 257).convert("I;16")
+    raise ValueError(f"Unsupported mode: {mode}")
+
+def write_sources(folder, megapixels, aspects, modes):
+    """Write every (resolution × aspect × mode) source; returns [(name, path, size, mode)]."""
+    sources = []
+    for mp in megapixels:
+        for aspect in aspects:
+            size = source_size(mp, parse_aspect(aspect))
+            base = None
+            for mode in modes:
+                fmt, ext = SOURCE_FORMATS[mode]
+                name = f"{mp:g}MP_{aspect.replace(':', 'x')}_{mode.replace(';', '')}"
+                path = os.path.join(folder, f"{name}.{ext}")
+                if base is None:
+                    base = synthetic_image(size, "RGB")
+                img = base if mode == "RGB" else synthetic_image(size, mode)
+                img.save(path, fmt)
+                sources.append((name, path, size, mode))
+    return sources
+
+# ------------------------
+# Measurement helpers
+# ------------------------
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)   # bytes on macOS
+    return round(peak / 1024, 1)                # KiB on Linux
+
+def timed(fn, repeat=1):
+    """Run fn `repeat` times; return (last result, best wall time in seconds)."""
+    best, result = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+def encode(img, fmt):
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, "JPEG", quality=QUALITY, optimize=True, progressive=True)
+    else:
+        img.save(buf, "PNG", **PNG_PROFILES["smallest"])
+    return buf.tell()
+
+def used_sizes(presets):
+    labels = []
+    for name in presets:
+        for label in PRESETS[name]:
+            if label not in labels:
+                labels.append(label)
+    return labels
+
+# ------------------------
+# Stage benchmarks
+# ------------------------
+def bench_decode(path, targets, mode="cover", repeat=1):
+    """
+    Decode one source the way the pipeline does: draft/reduce to the scale
+    the targets need, then plan_conversion's colour/mode conversion.
+    Returns (working copy, full size, ConversionPlan, best decode s, best convert s).
+    """
+    best = {"decode": float("inf"), "convert": float("inf")}
+    for _ in range(max(1, repeat)):
+        metrics = StageMetrics()
+        with open_source(path) as img:
+            factor = reduce_factor(*img.size, targets, mode=mode)
+            conversion = plan_conversion(img, targets, mode, factor)
+            src, full_size = decode_source(img, targets, mode=mode, metrics=metrics, conversion=conversion)
+            src = src.copy() if src is img else src     # outlive the closed file
+        for stage in best:
+            best[stage] = min(best[stage], metrics.totals[stage]["seconds"])
+    return src, full_size, conversion, best["decode"], best["convert"]
+
+def bench_source(path, labels, variants, repeat=1):
+    """
+    Time every stage for one source file. Decode and convert are timed per
+    resize mode (the decode scale depends on it); outputs of a late
+    conversion plan get their own per-size "convert" stage.
+    Returns {"decode": {mode: s}, "convert": {mode: s}, "sizes": {label: {variant: {stage: seconds}}}}.
+    """
+    targets = [SIZES[label][1] for label in labels]
+    decoded, t_decode, t_convert, plans = {}, {}, {}, {}
+    for mode in sorted({RESIZE_VARIANTS[v]["mode"] for v in variants}):
+        src, full_size, conversion, t_decode[mode], t_convert[mode] = bench_decode(path, targets, mode, repeat)
+        decoded[mode] = (src, conversion)
+        plans[mode] = ResamplePlan(src, targets, mode=mode, full_size=full_size)
+    sizes = {}
+    for label in labels:
+        W, H = SIZES[label][1]
+        sizes[label] = {}
+        for variant in variants:
+            opts = RESIZE_VARIANTS[variant]
+            src, conversion = decoded[opts["mode"]]
+            stages = {}
+            if opts["mode"] == "cover":
+                out, stages["cover_resize"] = timed(lambda: cover_resize(src, W, H), repeat)
+                _, stages["plan_resample"] = timed(lambda: plans["cover"].cover(W, H), repeat)
+            else:
+                out, stages["contain_resize"] = timed(lambda: contain_resize(src, W, H), repeat)
+                _, stages["plan_resample"] = timed(lambda: plans["contain"].contain(W, H), repeat)
+            if conversion.late:
+                resampled = out
+                out, stages["convert"] = timed(lambda: conversion.finish(resampled), repeat)
+            if opts.get("pad_exact"):
+                resized = out
+                out, stages["letterbox"] = timed(
+                    lambda: letterbox_canvas(resized, W, H, transparent=opts.get("transparent_pad", False),
+                                             bg_rgb=BG_RGB), repeat)
+            flat, stages["flatten"] = timed(lambda: flatten_if_needed(out, bg_rgb=BG_RGB), repeat)
+            _, stages["encode_jpeg"] = timed(lambda: encode(flat, "JPEG"), repeat)
+            png = out if out.mode in ("RGB", "RGBA") else out.convert("RGBA")
+            _, stages["encode_png"] = timed(lambda: encode(png, "PNG"), repeat)
+            sizes[label][variant] = {k: round(v, 6) for k, v in stages.items()}
+    return {
+        "decode": {mode: round(t, 6) for mode, t in t_decode.items()},
+        "convert": {mode: round(t, 6) for mode, t in t_convert.items()},
+        "sizes": sizes,
+    }
+
+def preset_rollup(stage_result, megapixels, presets, variants):
+    """
+    Per-preset cost of one source for every resize variant and export format,
+    assembled from the stage timings (decode + convert once for the variant's resize mode, then per size).
+    """
+    rows = []
+    for name in presets:
+        labels = PRESETS[name]
+        for variant in variants:
+            for fmt in EXPORT_FORMATS:
+                mode = RESIZE_VARIANTS[variant]["mode"]
+                total = stage_result["decode"][mode] + stage_result["convert"][mode]
+                for label in labels:
+                    st = stage_result["sizes"][label][variant]
+                    total += st["plan_resample"] + st.get("convert", 0.0) + st.get("letterbox", 0.0)
+                    if fmt == "JPEG":
+                        total += st["flatten"] + st["encode_jpeg"]
+                    else:
+                        total += st["encode_png"]
+                rows.append({
+                    "preset": name, "variant": variant, "format": fmt,
+                    "seconds": round(total, 6),
+                    "images_per_s": round(1 / total, 3) if total else None,
+                    "mp_per_s": round(megapixels / total, 3) if total else None,
+                })
+    return rows
+
+def bench_pipeline(path, out_dir, variants, repeat=1):
+    """End-to-end resize_for_platforms for 'All Platforms', Both formats."""
+    selection = [(label, SIZES[label]) for label in PRESETS["All Platforms"]]
+    rows = {}
+    for variant in variants:
+        opts = RESIZE_VARIANTS[variant]
+        _, t = timed(lambda: resize_for_platforms(
+            path, out_dir, selection, export_fmt="Both", quality=QUALITY,
+            logger=lambda msg: None, **opts), repeat)
+        rows[variant] = round(t, 6)
+    return rows
+
+# ------------------------
+# Cold start
+# ------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _wall(cmd, repeat):
+    """Best wall time of `repeat` fresh runs of cmd, in seconds."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, cwd=HERE, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def bench_cold_start(path, out_dir, repeat=5):
+    """
+    Fresh-process timings for short-lived jobs: a bare interpreter, importing
+    the batch front end, and `social_resizer_cli.py <source>` through its first
+    output (one Instagram post, JPEG). Also records whether Tkinter got loaded.
+    """
+    probe = "import sys, social_resizer_cli, social_resizer_batch; print('tkinter' in sys.modules)"
+    loaded = subprocess.run([sys.executable, "-c", probe], check=True, cwd=HERE,
+                            capture_output=True, text=True).stdout.strip() == "True"
+    first = [sys.executable, "social_resizer_cli.py", path, "-o", out_dir, "--size", "instagram_post"]
+    return {
+        "python": round(_wall([sys.executable, "-c", "pass"], repeat), 6),
+        "import": round(_wall([sys.executable, "-c", probe], repeat), 6),
+        "first_image": round(_wall(first, repeat), 6),
+        "tkinter_loaded": loaded,
+    }
+
+# ------------------------
+# Suite
+# ------------------------
+def run_suite(megapixels=(2, 12), aspects=("3:2", "9:16"), modes=tuple(SOURCE_FORMATS),
+              presets=None, variants=tuple(RESIZE_VARIANTS), repeat=1, pipeline=True, cold_start=True,
+              logger=None):
+    def log(msg):
+        (logger or print)(msg)
+
+    presets = [p for p in (presets or PRESETS) if PRESETS.get(p)]
+    labels = used_sizes(presets)
+    report = {
+        "version": BENCH_VERSION,
+        "meta": {
+            "python": platform.python_version(), "pillow": PIL.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "megapixels": list(megapixels), "aspects": list(aspects), "modes": list(modes),
+            "presets": presets, "variants": list(variants), "repeat": repeat,
+        },
+        "sources": {},
+    }
+    work = tempfile.mkdtemp(prefix="socialresizer-bench-")
+    try:
+        sources = write_sources(work, megapixels, aspects, modes)
+        for name, path, size, mode in sources:
+            mp = size[0] * size[1] / 1e6
+            log(f"{name}: {size[0]}×{size[1]} {mode}")
+            stages = bench_source(path, labels, variants, repeat)
+            entry = {
+                "size": list(size), "mode": mode, "megapixels": round(mp, 3),
+                "stages": stages,
+                "presets": preset_rollup(stages, mp, presets, variants),
+            }
+            if pipeline:
+                entry["pipeline"] = bench_pipeline(path, os.path.join(work, "out"), variants, repeat)
+            entry["peak_rss_mb"] = peak_rss_mb()
+            report["sources"][name] = entry
+        if cold_start and sources:
+            log("cold start")
+            report["cold_start"] = bench_cold_start(sources[0][1], os.path.join(work, "cold"), max(3, repeat))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    report["metrics"] = flatten_metrics(report)
+    return report
+
+def flatten_metrics(report):
+    """Flat {metric name: seconds} view used for baseline comparison."""
+    metrics = {}
+    for name, entry in report["sources"].items():
+        st = entry["stages"]
+        for mode in st["decode"]:
+            metrics[f"{name}/decode/{mode}"] = st["decode"][mode]
+            metrics[f"{name}/convert/{mode}"] = st["convert"][mode]
+        for label, variants in st["sizes"].items():
+            key = SIZES[label][0]
+            for variant, stages in variants.items():
+                for stage, t in stages.items():
+                    metrics[f"{name}/{key}/{variant}/{stage}"] = t
+        for row in entry["presets"]:
+            metrics[f"{name}/preset/{row['preset']}/{row['variant']}/{row['format']}"] = row["seconds"]
+        for variant, t in entry.get("pipeline", {}).items():
+            metrics[f"{name}/pipeline/{variant}"] = t
+    for stage in ("import", "first_image"):
+        if stage in report.get("cold_start", {}):
+            metrics[f"cold_start/{stage}"] = report["cold_start"][stage]
+    return metrics
+
+AGGREGATE_MARKERS = ("/preset/", "/pipeline/", "/decode", "/convert", "cold_start/")
+
+def compare(current, baseline, threshold=0.15, min_delta=0.005, stages=False):
+    """
+    Compare flat metrics. By default only aggregates (presets, pipeline,
+    decode, convert) are compared; per-stage timings are noisy at the
+    millisecond scale and are included with stages=True.
+    Returns (regressions, improvements) as lists of
+    (metric, baseline seconds, current seconds, relative change).
+    """
+    regressions, improvements = [], []
+    base = baseline.get("metrics", {})
+    for name, now in current["metrics"].items():
+        if name not in base or not base[name]:
+            continue
+        if not stages and not any(m in name for m in AGGREGATE_MARKERS):
+            continue
+        before = base[name]
+        change = (now - before) / before
+        if abs(now - before) < min_delta:
+            continue
+        if change > threshold:
+            regressions.append((name, before, now, change))
+        elif change < -threshold:
+            improvements.append((name, before, now, change))
+    regressions.sort(key=lambda r: -r[3])
+    improvements.sort(key=lambda r: r[3])
+    return regressions, improvements
+
+# ------------------------
+# CLI
+# ------------------------
+def build_parser():
+    p = argparse.ArgumentParser(prog="social_resizer_bench", description="Benchmark the resize/export pipeline.")
+    p.add_argument("--megapixels", type=float, nargs="+", default=[2, 12])
+    p.add_argument("--aspects", nargs="+", default=["3:2", "9:16"], help="e.g. 3:2 4:3 16:9 9:16 1:1")
+    p.add_argument("--modes", nargs="+", default=list(SOURCE_FORMATS), choices=list(SOURCE_FORMATS))
+    p.add_argument("--presets", nargs="+", default=None, help="Preset names (default: all)")
+    p.add_argument("--variants", nargs="+", default=list(RESIZE_VARIANTS), choices=list(RESIZE_VARIANTS))
+    p.add_argument("--repeat", type=int, default=1, help="Best of N timings per stage")
+    p.add_argument("--no-pipeline", action="store_true", help="Skip end-to-end resize_for_platforms runs")
+    p.add_argument("--no-cold-start", action="store_true", help="Skip the fresh-process startup timings")
+    p.add_argument("--quick", action="store_true",
+                   help="Small smoke run (1 MP, 3:2, RGB + RGBA, two presets, cover + transparent letterbox)")
+    p.add_argument("-o", "--output", help="Write JSON report here (default: stdout)")
+    p.add_argument("--save", metavar="BASELINE", help="Also store the report as a baseline")
+    p.add_argument("--compare", metavar="BASELINE", help="Compare against a stored baseline")
+    p.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown counted as regression")
+    p.add_argument("--stages", action="store_true", help="Also compare individual stage timings")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quick:
+        args.megapixels, args.aspects, args.modes = [1], ["3:2"], ["RGB", "RGBA"]
+        args.presets = args.presets or ["Instagram – All", "LinkedIn Ads"]
+        args.variants = ["cover", "contain_pad_alpha"]
+
+    report = run_suite(
+        megapixels=args.megapixels, aspects=args.aspects, modes=args.modes,
+        presets=args.presets, variants=args.variants, repeat=args.repeat,
+        pipeline=not args.no_pipeline, cold_start=not args.no_cold_start, logger=lambda msg: sys.stderr.write(msg + "\n"),
+    )
+    text = json.dumps(report, indent=1, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    elif not args.compare:
+        print(text)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, improvements = compare(report, baseline, threshold=args.threshold, stages=args.stages)
+        for name, before, now, change in improvements:
+            print(f"faster  {change:+7.1%}  {before:.4f}s -> {now:.4f}s  {name}")
+        for name, before, now, change in regressions:
+            print(f"SLOWER  {change:+7.1%}  {before:.4f}s -> {now:.4f}s  {name}")
+        print(f"{len(regressions)} regressions, {len(improvements)} improvements "
+              f"(threshold {args.threshold:.0%})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+SocialResizer — content-addressed output cache.
+A JSON manifest (one per output folder by default) records, for every output
+file, a key derived from the SHA-256 of the source bytes plus every setting
+that affects the pixels. On re-runs an output whose key is unchanged and whose
+file still exists is skipped without decoding the source.
+
+Source digests are memoized by (size, mtime) so unchanged sources are not
+re-hashed either; an incremental run only stats files.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_NAME = ".socialresizer-cache.json"
+MANIFEST_VERSION = 1
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class OutputCache:
+    """
+    Persistent manifest: output path -> {key, source, digest}.
+    Call save() after a run; nothing is written to disk before that.
+    Safe to share between threads.
+    """
+
+    def __init__(self, manifest_path: str, force: bool = False):
+        self.manifest_path = manifest_path
+        self.force = force          # treat every output as stale (still records new keys)
+        self.sources = {}           # abs source path -> {size, mtime_ns, sha256}
+        self.outputs = {}           # abs output path -> {key, source, digest}
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str, force: bool = False):
+        return cls(os.path.join(output_dir, MANIFEST_NAME), force=force)
+
+    # ---------- persistence ----------
+    def _load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.sources = data.get("sources", {})
+        self.outputs = data.get("outputs", {})
+
+    def save(self):
+        """Atomically write the manifest if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            folder = os.path.dirname(os.path.abspath(self.manifest_path))
+            os.makedirs(folder, exist_ok=True)
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "sources": self.sources,
+                           "outputs": self.outputs}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+            self._dirty = False
+
+    # ---------- keys ----------
+    def source_digest(self, path: str) -> str:
+        """Digest of a source file, re-hashed only when its size or mtime changed."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        entry = self.sources.get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha256"]
+        digest = file_digest(path)
+        with self._lock:
+            self.sources[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            self._dirty = True
+        return digest
+
+    @staticmethod
+    def output_key(digest: str, platform_key: str, size, ext: str, params: dict) -> str:
+        """Key for one output: source digest + target + every pixel-affecting setting."""
+        blob = json.dumps(
+            {"src": digest, "key": platform_key, "size": list(size), "ext": ext, "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # ---------- lookups ----------
+    def is_fresh(self, output_path: str, key: str) -> bool:
+        if self.force:
+            return False
+        entry = self.outputs.get(os.path.abspath(output_path))
+        return bool(entry) and entry["key"] == key and os.path.exists(output_path)
+
+    def record(self, output_path: str, key: str, source_path: str, digest: str):
+        with self._lock:
+            self.outputs[os.path.abspath(output_path)] = {
+                "key": key, "source": os.path.abspath(source_path), "digest": digest,
+            }
+            self._dirty = True
+
+    def prune(self) -> int:
+        """
+        Drop entries whose output file is gone, whose source is gone, or whose
+        source bytes changed since the output was written. Returns the count.
+        """
+        with self._lock:
+            return self._prune()
+
+    def _prune(self):
+        stale = []
+        for out_path, entry in list(self.outputs.items()):
+            src = entry["source"]
+            if not os.path.exists(out_path) or not os.path.exists(src):
+                stale.append(out_path)
+            elif self.source_digest(src) != entry["digest"]:
+                stale.append(out_path)
+        for out_path in stale:
+            del self.outputs[out_path]
+        live = {e["source"] for e in self.outputs.values()}
+        for src in [s for s in self.sources if s not in live]:
+            del self.sources[src]
+        if stale:
+            self._dirty = True
+        return len(stale)
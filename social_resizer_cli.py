@@ -0,0 +1,65 @@
+"""
+SocialResizer — command-line entry point.
+Imports only the front end that is asked for, so one-shot jobs start with the
+processing core alone: no Tkinter, no worker-pool machinery unless a run
+actually needs it.
+
+Usage:
+    python social_resizer_cli.py photo.jpg -o out --preset "Instagram – All"
+    python social_resizer_cli.py batch photos/ -o out -j 8
+    python social_resizer_cli.py watch --watch "drop/instagram=Instagram – All" -o ready
+    python social_resizer_cli.py queue work --broker /shared/queue.db
+    python social_resizer_cli.py bench --quick
+    python social_resizer_cli.py gui
+"""
+
+import importlib
+import sys
+
+# command -> front-end module (each has main(argv=None))
+COMMANDS = {
+    "batch": "social_resizer_batch",
+    "watch": "social_resizer_watch",
+    "queue": "social_resizer_queue",
+    "bench": "social_resizer_bench",
+    "gui": "social_resizer_gui",
+}
+DEFAULT_COMMAND = "batch"   # `social_resizer_cli.py SOURCE ...` = batch
+FROZEN = getattr(sys, "frozen", False)  # the PyInstaller CLI build leaves out the GUI (SocialResizer.spec)
+
+USAGE = """usage: social_resizer_cli.py [batch|watch|queue|bench|gui] [args...]
+
+  batch   resize files, folders or globs (the default command)
+  watch   watch folders and resize new images as they arrive
+  queue   submit to / work on / inspect a shared job queue
+  bench   benchmark the pipeline
+  gui     start the desktop app
+
+Run a command with --help for its options."""
+if FROZEN:
+    USAGE = USAGE.replace("|gui]", "]").replace("  gui     start the desktop app\n", "")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(USAGE)
+        return 0 if argv else 2
+    command = argv.pop(0) if argv[0] in COMMANDS else DEFAULT_COMMAND
+    try:
+        module = importlib.import_module(COMMANDS[command])
+    except ImportError as e:
+        if command != "gui":
+            raise
+        hint = ("this build has no desktop app; start the SocialResizer app instead" if FROZEN
+                else "install Tkinter (see Troubleshooting in the README)")
+        sys.stderr.write(f"gui: cannot start the desktop app ({e}): {hint}\n")
+        return 2
+    if command == "gui":
+        return module.main()
+    return module.main(argv)
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
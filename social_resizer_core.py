@@ -0,0 +1,1035 @@
+"""
+SocialResizer — image processing core.
+Sizes, presets, resize geometry, the shared resample plan and
+resize_for_platforms, without any GUI dependency: batch, watch, bench and
+short-lived headless jobs import this module without loading Tkinter, and
+only the Pillow plugins a job actually needs are loaded.
+"""
+
+import contextlib
+import importlib
+import io
+import math
+import os
+import threading
+from PIL import Image, ImageChops, ImageStat, features
+
+# ------------------------
+# Canonical sizes (pixels)
+# ------------------------
+SIZES = {
+    "Instagram Post (1080×1080)": ("instagram_post", (1080, 1080)),
+    "Instagram Portrait 4:5 (1080×1350)": ("instagram_portrait", (1080, 1350)),
+    "Instagram Story/Reel (1080×1920)": ("instagram_story", (1080, 1920)),
+    "Facebook Post (1200×630)": ("facebook_post", (1200, 630)),
+    "LinkedIn Post (1200×627)": ("linkedin_post", (1200, 627)),
+    "X/Twitter Post (1600×900)": ("twitter_post", (1600, 900)),
+    "YouTube Thumbnail (1280×720)": ("youtube_thumb", (1280, 720)),
+    "Landscape 16:9 (1920×1080)": ("landscape_16_9", (1920, 1080)),
+    "Pinterest Tall (1000×1500)": ("pinterest_tall", (1000, 1500)),
+}
+
+# ------------------------
+# Preset bundles/profiles
+# ------------------------
+PRESETS = {
+    "-- Choose preset --": [],
+    "Instagram – All": [
+        "Instagram Post (1080×1080)",
+        "Instagram Portrait 4:5 (1080×1350)",
+        "Instagram Story/Reel (1080×1920)",
+    ],
+    "Instagram – Feed Only": [
+        "Instagram Post (1080×1080)",
+        "Instagram Portrait 4:5 (1080×1350)",
+    ],
+    "Stories/Reels": [
+        "Instagram Story/Reel (1080×1920)",
+    ],
+    "LinkedIn – Post": [
+        "LinkedIn Post (1200×627)",
+    ],
+    "Facebook – Post": [
+        "Facebook Post (1200×630)",
+    ],
+    "X/Twitter – Post": [
+        "X/Twitter Post (1600×900)",
+    ],
+    # Paid ads oriented bundles
+    "Meta Ads (IG+FB)": [
+        "Instagram Post (1080×1080)",
+        "Instagram Portrait 4:5 (1080×1350)",
+        "Landscape 16:9 (1920×1080)",
+    ],
+    "LinkedIn Ads": [
+        "LinkedIn Post (1200×627)",   # 1.91:1
+        "Landscape 16:9 (1920×1080)",
+    ],
+    "YouTube – Thumbnail": [
+        "YouTube Thumbnail (1280×720)",
+    ],
+    "All Platforms": list(SIZES.keys()),
+}
+
+# ------------------------
+# Windows reserved names
+# ------------------------
+RESERVED = {
+    "CON","PRN","AUX","NUL",
+    "COM1","COM2","COM3","COM4","COM5","COM6","COM7","COM8","COM9",
+    "LPT1","LPT2","LPT3","LPT4","LPT5","LPT6","LPT7","LPT8","LPT9",
+}
+
+def sanitize_basename(name: str) -> str:
+    """Ensure safe Windows filename base (no reserved device names)."""
+    base = name.strip().rstrip(". ")
+    if base.upper() in RESERVED:
+        base = f"{base}_img"
+    return base
+
+def hex_to_rgb(hx: str):
+    """#RRGGBB -> (R,G,B). Gracefully fallback to white."""
+    try:
+        hx = hx.strip().lstrip("#")
+        if len(hx) == 3:  # e.g., #fff
+            hx = "".join(c*2 for c in hx)
+        r = int(hx[0:2], 16)
+        g = int(hx[2:4], 16)
+        b = int(hx[4:6], 16)
+        return (r, g, b)
+    except Exception:
+        return (255, 255, 255)
+
+def cover_box(w: int, h: int, W: int, H: int, anchor=None):
+    """
+    Crop box (left, top, right, bottom) with W:H aspect inside w×h: centered,
+    or placed at anchor=(x, y), fractions (0-1) of the slack on each axis.
+    """
+    src_ratio = w / h
+    target_ratio = W / H
+    if src_ratio > target_ratio:
+        # Crop width
+        new_height = h
+        new_width = int(target_ratio * new_height)
+    else:
+        # Crop height
+        new_width = w
+        new_height = int(new_width / target_ratio)
+    if anchor is None:
+        left = (w - new_width) // 2
+        top = (h - new_height) // 2
+    else:
+        left = round((w - new_width) * anchor[0])
+        top = round((h - new_height) * anchor[1])
+    return (left, top, left + new_width, top + new_height)
+
+def contain_size(w: int, h: int, W: int, H: int):
+    """Output size of contain_resize for a w×h source (same rounding as Image.thumbnail)."""
+    if W >= w and H >= h:
+        return (w, h)
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+    aspect = w / h
+    if W / H >= aspect:
+        return (round_aspect(H * aspect, key=lambda n: abs(aspect - n / H)), H)
+    return (W, round_aspect(W / aspect, key=lambda n: 0 if n == 0 else abs(aspect - W / n)))
+
+def cover_resize(src: Image.Image, W: int, H: int, anchor=None) -> Image.Image:
+    """Fill target (COVER): crop overflow, then resize exactly to (W,H)."""
+    crop = src.crop(cover_box(src.width, src.height, W, H, anchor))
+    return crop.resize((W, H), Image.Resampling.LANCZOS)
+
+def contain_resize(src: Image.Image, W: int, H: int) -> Image.Image:
+    """Fit inside (CONTAIN): keep aspect ratio; result <= (W,H)."""
+    size = contain_size(src.width, src.height, W, H)
+    if size == src.size:
+        return src.copy()
+    # Same result as copy() + thumbnail(), without the full-size copy
+    return src.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+def letterbox_canvas(resized: Image.Image, W: int, H: int, transparent: bool, bg_rgb=(255,255,255)):
+    """
+    Center 'resized' on an exact WxH canvas.
+    If transparent=True -> RGBA canvas; else RGB canvas filled with bg_rgb
+    (an RGBA image is composited onto it).
+    """
+    x = (W - resized.width) // 2
+    y = (H - resized.height) // 2
+    if transparent:
+        canvas = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+        canvas.paste(resized, (x, y))  # onto clear pixels: a plain copy keeps the image's own alpha
+    else:
+        canvas = Image.new("RGB", (W, H), bg_rgb)
+        canvas.paste(resized, (x, y), resized if resized.mode == "RGBA" else None)
+    return canvas
+
+def palette_letterbox(resized: Image.Image, W: int, H: int, transparent: bool, bg_rgb=(255,255,255)):
+    """
+    Palette (P) version of letterbox_canvas for PNG: the image is quantized to
+    255 colours and the flat padding gets its own exact palette entry (index
+    255, marked transparent when transparent=True). Lossy for photos, but the
+    PNG is ~3-4× smaller and much faster to compress. With transparent=True
+    an RGBA image keeps its own alpha: it is quantized with alpha and every
+    entry's alpha goes into the PNG's tRNS chunk.
+    Returns (image, save params).
+    """
+    if transparent and resized.mode == "RGBA":
+        inner = resized.quantize(255, method=Image.Quantize.FASTOCTREE)
+        entries = inner.getpalette("RGBA")[:255 * 4]
+        entries += [0] * (255 * 4 - len(entries)) + [0, 0, 0, 0]
+        palette = [v for i, v in enumerate(entries) if i % 4 != 3]
+        params = {"transparency": bytes(entries[3::4])}
+    else:
+        inner = flatten_if_needed(resized, bg_rgb).quantize(255, method=Image.Quantize.FASTOCTREE)
+        palette = inner.getpalette()[:255 * 3]
+        palette += [0] * (255 * 3 - len(palette)) + list((0, 0, 0) if transparent else bg_rgb)
+        params = {"transparency": 255} if transparent else {}
+    canvas = Image.new("P", (W, H), 255)
+    canvas.putpalette(palette)
+    canvas.paste(inner, ((W - resized.width) // 2, (H - resized.height) // 2))
+    return canvas, params
+
+def flatten_if_needed(img: Image.Image, bg_rgb=(255,255,255)) -> Image.Image:
+    """Ensure no alpha when saving to JPEG (composite on bg if needed)."""
+    if img.mode in ("RGBA", "LA"):
+        bg = Image.new("RGB", img.size, bg_rgb)
+        bg.paste(img, mask=img.split()[-1])  # use alpha channel as mask
+        return bg
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+# ------------------------
+# Shared downscale pyramid
+# ------------------------
+PYRAMID_OVERSAMPLE = 2.0  # a level must stay at least this × the target size
+DERIVE_MAX_LOSS = 1.0     # mean abs error (0-255) a cover output derived from a larger one may add
+DERIVE_PROBE = 64         # side of the probe tiles used to measure that error (output pixels)
+
+def target_scale(w: int, h: int, W: int, H: int, mode="cover") -> float:
+    """Linear scale factor from a w×h source to target (W,H) in the given mode."""
+    if mode == "cover":
+        left, top, right, bottom = cover_box(w, h, W, H)
+        return max(W / (right - left), H / (bottom - top))
+    cw, ch = contain_size(w, h, W, H)
+    return max(cw / w, ch / h)
+
+def reduce_factor(w: int, h: int, targets, mode="cover", oversample=PYRAMID_OVERSAMPLE) -> int:
+    """Largest integer reduce factor of a w×h source that still oversamples every target."""
+    if not oversample or not targets:
+        return 1
+    scale = max(target_scale(w, h, W, H, mode) for (W, H) in targets)
+    return max(1, int(1 / (oversample * scale)))
+
+def cover_groups(w: int, h: int, targets, anchors=None) -> dict:
+    """
+    Group cover targets by crop rectangle: map each target to the largest other
+    target whose crop box (on a w×h source) contains its own and whose output
+    is at least as large as that box. Targets mapped to nothing are resampled
+    from the source; only those can be parents, so derivation is one level deep.
+    anchors: {target: crop anchor} for targets not cropped centered.
+    """
+    anchors = anchors or {}
+    order = sorted(set(map(tuple, targets)), key=lambda t: -t[0] * t[1])
+    roots, parents = [], {}
+    for W, H in order:
+        left, top, right, bottom = cover_box(w, h, W, H, anchors.get((W, H)))
+        for P in roots:
+            pl, pt, pr, pb = cover_box(w, h, *P, anchors.get(P))
+            inside = pl <= left and pt <= top and right <= pr and bottom <= pb
+            # the parent must hold at least W×H pixels of the child's box
+            if inside and P[0] * (right - left) >= W * (pr - pl) and P[1] * (bottom - top) >= H * (pb - pt):
+                parents[(W, H)] = P
+                break
+        else:
+            roots.append((W, H))
+    return parents
+
+def _sub_box(box, frac):
+    """Part of box given as fractions (x0, y0, x1, y1) of its width and height."""
+    left, top, right, bottom = box
+    w, h = right - left, bottom - top
+    return (left + frac[0] * w, top + frac[1] * h, left + frac[2] * w, top + frac[3] * h)
+
+class ResamplePlan:
+    """
+    Per-source resampling plan: a small pyramid of box-reduced levels shared by
+    every target in the selection. Each target is resampled (LANCZOS) from the
+    smallest level that still oversamples it by PYRAMID_OVERSAMPLE, instead of
+    from full resolution every time. Geometry (crop box, output size) is always
+    computed on the full-resolution source size, so outputs match the direct
+    path even when `src` was itself decoded at reduced scale (see decode_source).
+
+    In cover mode with derive_loss set, targets whose crop box lies inside the
+    crop box of a larger target are grouped under it (see cover_groups): the
+    larger output is resampled once and the smaller ones are derived from it,
+    unless probe tiles show they would differ from a direct resample by more
+    than derive_loss. derive_loss=None (strict) resamples every target directly.
+    anchors ({target: (x, y)}, see cover_box) moves the crop of those targets
+    off center.
+    """
+
+    def __init__(self, src: Image.Image, targets, mode="cover", oversample=PYRAMID_OVERSAMPLE,
+                 full_size=None, lean=False, derive_loss=None, anchors=None):
+        self.src = src
+        self.full_size = full_size or src.size
+        self.lean = lean  # never copy a crop of src (box resample instead; edge pixels may differ)
+        self.mode = mode
+        self.oversample = oversample
+        self.levels = {1: src}  # integer reduce factor (relative to src) -> level
+        self.parents = {}       # target -> larger target it may be derived from
+        self.derived = {}       # target -> parent it was actually derived from
+        self.derive_loss = derive_loss
+        self.anchors = dict(anchors or {})
+        self._lock = threading.Lock()
+        self._rendered = {}     # parent target -> [lock, image, remaining uses]
+        if mode == "cover" and derive_loss is not None:
+            self.parents = cover_groups(*self.full_size, targets, self.anchors)
+            for parent in set(self.parents.values()):
+                uses = 1 + sum(1 for p in self.parents.values() if p == parent)
+                self._rendered[parent] = [threading.Lock(), None, uses]
+        if oversample:
+            # Build every level up front (largest first) so smaller levels can be
+            # reduced from an already reduced one instead of the full source.
+            for factor in sorted({self.factor_for(W, H) for (W, H) in targets}):
+                self._level(factor)
+
+    def box(self, W: int, H: int):
+        """Crop box of cover target (W,H) on the full-resolution source."""
+        return cover_box(*self.full_size, W, H, self.anchors.get((W, H)))
+
+    @property
+    def exact(self) -> bool:
+        """True when src is the full-resolution source."""
+        return self.src.size == tuple(self.full_size)
+
+    def target_scale(self, W: int, H: int) -> float:
+        """Linear scale factor from src to target (W,H)."""
+        fw, fh = self.full_size
+        return target_scale(fw, fh, W, H, self.mode) * min(fw / self.src.width, fh / self.src.height)
+
+    def factor_for(self, W: int, H: int) -> int:
+        """Largest integer reduce factor of src that still oversamples target (W,H)."""
+        if not self.oversample:
+            return 1
+        return max(1, int(1 / (self.oversample * self.target_scale(W, H))))
+
+    def _level(self, factor: int) -> Image.Image:
+        if factor not in self.levels:
+            base = max(f for f in self.levels if factor % f == 0)
+            self.levels[factor] = self.levels[base].reduce(factor // base)
+        return self.levels[factor]
+
+    def level_for(self, W: int, H: int) -> Image.Image:
+        """Smallest pyramid level still >= oversample × the target (src if none)."""
+        return self._level(self.factor_for(W, H))
+
+    def cover(self, W: int, H: int) -> Image.Image:
+        parent = self.parents.get((W, H))
+        if parent is None:
+            return self._shared((W, H)) if (W, H) in self._rendered else self._cover_direct(W, H)
+        base = self._shared(parent)
+        box = self._box_in(parent, W, H)
+        if self._probe_loss(base, box, W, H) > self.derive_loss:
+            return self._cover_direct(W, H)
+        self.derived[(W, H)] = parent
+        return base.resize((W, H), Image.Resampling.LANCZOS, box=box)
+
+    def _shared(self, target) -> Image.Image:
+        """Direct cover of a parent target: rendered once, dropped after its last use."""
+        entry = self._rendered[target]
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = self._cover_direct(*target)
+            image = entry[1]
+        with self._lock:
+            entry[2] -= 1
+            if entry[2] == 0:
+                entry[1] = None
+        return image
+
+    def _box_in(self, parent, W: int, H: int):
+        """Crop box of target (W,H), in pixel coordinates of the parent's output."""
+        pl, pt, pr, pb = self.box(*parent)
+        left, top, right, bottom = self.box(W, H)
+        sx = parent[0] / (pr - pl)
+        sy = parent[1] / (pb - pt)
+        return ((left - pl) * sx, (top - pt) * sy, (right - pl) * sx, (bottom - pt) * sy)
+
+    def _probe_loss(self, base: Image.Image, box, W: int, H: int) -> float:
+        """Mean abs error of derived vs direct resampling, measured on a few small output tiles."""
+        level = self.level_for(W, H)
+        fw, fh = self.full_size
+        sx = level.width / fw
+        sy = level.height / fh
+        left, top, right, bottom = self.box(W, H)
+        direct_box = (left * sx, top * sy, right * sx, bottom * sy)
+        tile = min(DERIVE_PROBE, W, H)
+        errors = []
+        for fx, fy in ((0.5, 0.5), (0.25, 0.25), (0.75, 0.75)):
+            x0 = round((W - tile) * fx)
+            y0 = round((H - tile) * fy)
+            sub = (x0 / W, y0 / H, (x0 + tile) / W, (y0 + tile) / H)
+            a = base.resize((tile, tile), Image.Resampling.LANCZOS, box=_sub_box(box, sub))
+            b = level.resize((tile, tile), Image.Resampling.LANCZOS, box=_sub_box(direct_box, sub))
+            errors.append(sum(ImageStat.Stat(ImageChops.difference(a, b)).mean) / len(a.getbands()))
+        return max(errors)
+
+    def _cover_direct(self, W: int, H: int) -> Image.Image:
+        level = self.level_for(W, H)
+        if level is self.src and self.exact and not self.lean:
+            return cover_resize(self.src, W, H, self.anchors.get((W, H)))
+        fw, fh = self.full_size
+        sx = level.width / fw
+        sy = level.height / fh
+        left, top, right, bottom = self.box(W, H)
+        return level.resize((W, H), Image.Resampling.LANCZOS,
+                            box=(left * sx, top * sy, right * sx, bottom * sy))
+
+    def contain(self, W: int, H: int) -> Image.Image:
+        level = self.level_for(W, H)
+        if level is self.src and self.exact:
+            return contain_resize(self.src, W, H)
+        return level.resize(contain_size(*self.full_size, W, H), Image.Resampling.LANCZOS)
+
+# ------------------------
+# Instrumentation
+# ------------------------
+class _NullMetrics:
+    """Stand-in when no metrics object is given: stage() times nothing."""
+
+    def stage(self, name, **fields):
+        return contextlib.nullcontext(fields)
+
+NULL_METRICS = _NullMetrics()
+
+# ------------------------
+# Colour and mode planning
+# ------------------------
+RESAMPLE_MODES = ("L", "LA", "RGB", "RGBA", "CMYK")  # modes reduce()/resize() average as they are
+CHEAP_RESAMPLE_MODES = ("L", "LA")                   # resample faster than their RGB/RGBA output mode
+TRANSFORM_MEMO = 16                                  # ICC transforms kept per process
+
+_transforms = {}        # (profile bytes, in mode, out mode) -> ImageCms transform, or None if unusable
+_transforms_lock = threading.Lock()
+
+def has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info
+
+def _to_8bit(img: Image.Image) -> Image.Image:
+    """
+    16-bit grayscale (I;16*, or I as Pillow opens 16-bit PNGs/TIFFs) -> L,
+    mapping 0-65535 onto 0-255 instead of clipping at 255. Always scaled,
+    whatever the values, so a dark frame stays dark and strips match.
+    """
+    img = img if img.mode == "I" else img.convert("I")
+    return img.point(lambda v: v / 257 + 0.5).convert("L")
+
+def _icc_transform(profile: bytes, in_mode: str, out_mode: str):
+    """Transform from an embedded profile to sRGB; None for sRGB itself or an unusable profile."""
+    key = (profile, in_mode, out_mode)
+    with _transforms_lock:
+        if key in _transforms:
+            return _transforms[key]
+    from PIL import ImageCms  # only sources with an embedded profile pay for it
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(profile))
+        if in_mode in ("RGB", "RGBA") and ImageCms.getProfileDescription(source).strip().startswith("sRGB"):
+            transform = None
+        else:
+            # NOCACHE: outputs of one source are converted on several threads at once
+            transform = ImageCms.buildTransform(source, ImageCms.createProfile("sRGB"), in_mode, out_mode,
+                                                flags=ImageCms.Flags.NOCACHE)
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        transform = None
+    with _transforms_lock:
+        if len(_transforms) >= TRANSFORM_MEMO:
+            _transforms.pop(next(iter(_transforms)))
+        _transforms[key] = transform
+    return transform
+
+class ConversionPlan:
+    """
+    How one source gets from its decoded mode to the sRGB RGB/RGBA outputs,
+    decided once per source. The source is first brought to `decode_mode`
+    (palette, bilevel and 16-bit images, which reduce() cannot average, are
+    converted right after decoding; everything else is left as is). From
+    there one conversion - an ICC transform to sRGB, or a plain convert() -
+    yields `out_mode`: RGBA for sources with alpha, else RGB. With late=True
+    the working copy and pyramid stay in decode_mode and each output is
+    converted after resampling, which touches fewer pixels whenever the
+    outputs together are smaller than the working copy.
+    """
+
+    def __init__(self, decode_mode: str, out_mode: str, transform=None, late=False):
+        self.decode_mode = decode_mode
+        self.out_mode = out_mode
+        self.transform = transform  # ImageCms transform decode_mode -> out_mode, or None
+        self.late = late and not self.noop
+
+    @property
+    def noop(self) -> bool:
+        return self.decode_mode == self.out_mode and self.transform is None
+
+    @property
+    def work_mode(self) -> str:
+        """Mode of the working copy and pyramid."""
+        return self.decode_mode if self.late else self.out_mode
+
+    def prepare(self, img: Image.Image) -> Image.Image:
+        """Decoded image -> decode_mode (img itself when it is already there)."""
+        if img.mode == self.decode_mode:
+            return img
+        if self.decode_mode == "L" and img.mode.startswith("I"):
+            return _to_8bit(img)
+        return img.convert(self.decode_mode)
+
+    def finish(self, img: Image.Image) -> Image.Image:
+        """decode_mode image -> sRGB out_mode (img itself when that is a no-op)."""
+        if self.transform is not None:
+            from PIL import ImageCms
+            return ImageCms.applyTransform(img, self.transform)
+        return img if img.mode == self.out_mode else img.convert(self.out_mode)
+
+    def working_copy(self, img: Image.Image, factor: int) -> Image.Image:
+        """Working copy in work_mode, reduced by factor before any colour conversion."""
+        img = self.prepare(img)
+        if factor > 1:
+            img = img.reduce(factor)
+        return img if self.late else self.finish(img)
+
+def plan_conversion(img: Image.Image, targets=(), mode="cover", factor=1, color_manage=True) -> ConversionPlan:
+    """
+    ConversionPlan for an opened image. An embedded ICC profile (other than
+    sRGB) is converted to sRGB when color_manage is set; without a profile
+    CMYK and friends use Pillow's plain conversion. Conversion is late when
+    the target outputs hold fewer pixels than the working copy (the source
+    reduced by factor) and either an ICC transform is involved (~10× the
+    cost of a plain convert per pixel) or the source mode resamples faster
+    than RGB. Plain CMYK stays early: Pillow resamples 4-band CMYK ~1.5×
+    slower than RGB, which costs more than the conversion it saves.
+    """
+    alpha = has_alpha(img)
+    out_mode = "RGBA" if alpha else "RGB"
+    if img.mode in RESAMPLE_MODES and not (alpha and img.mode in ("L", "RGB")):
+        decode_mode = img.mode
+    elif img.mode in ("1", "F") or img.mode.startswith("I"):
+        decode_mode = "LA" if alpha else "L"
+    else:                           # palette, transparency keys, YCbCr, LAB, ...
+        decode_mode = out_mode
+    profile = img.info.get("icc_profile") if color_manage else None
+    transform = _icc_transform(profile, decode_mode, out_mode) if profile else None
+    w, h = img.size
+    working = math.ceil(w / factor) * math.ceil(h / factor)
+    outputs = sum(W * H if mode == "cover" else math.prod(contain_size(w, h, W, H)) for W, H in targets)
+    late = bool(targets) and outputs < working and (transform is not None or decode_mode in CHEAP_RESAMPLE_MODES)
+    return ConversionPlan(decode_mode, out_mode, transform, late=late)
+
+# ------------------------
+# Decode planning
+# ------------------------
+def decode_source(img: Image.Image, targets, mode="cover", oversample=PYRAMID_OVERSAMPLE, metrics=None,
+                  memory_budget=None, conversion=None):
+    """
+    Decode an opened image at the smallest scale that still oversamples every
+    target. JPEGs use Pillow's draft mode (DCT scaling: 1/2, 1/4, 1/8) so the
+    discarded pixels are never decoded; other formats are box-reduced right
+    after decoding, before any colour conversion. Returns (src, full_size)
+    where full_size is the original size and src is in conversion.work_mode
+    (default: plan_conversion(img), i.e. sRGB RGB/RGBA).
+    oversample=0 decodes at full resolution. With memory_budget (bytes) the
+    decode is planned by plan_memory() and the working copy is built in strips.
+    src may be `img` itself when no conversion is needed.
+    """
+    metrics = metrics or NULL_METRICS
+    conversion = conversion or plan_conversion(img)
+    full_size = img.size
+    factor = reduce_factor(*full_size, targets, mode=mode, oversample=oversample)
+    if memory_budget:
+        factor = plan_memory(img, targets, mode, factor, memory_budget).decode_factor
+    if factor > 1 and img.format in ("JPEG", "MPO"):
+        img.draft("RGB", (math.ceil(full_size[0] / factor), math.ceil(full_size[1] / factor)))
+        factor = 1 if img.size != full_size else factor
+    with metrics.stage("decode", source_size=full_size, factor=factor) as info:
+        img.load()
+        info["pixels"] = img.width * img.height
+    with metrics.stage("convert", mode=img.mode, to=conversion.work_mode, pixels=img.width * img.height):
+        if memory_budget and (factor > 1 or img.mode != conversion.work_mode):
+            return _reduced_strips(img, factor, conversion), full_size
+        return conversion.working_copy(img, factor), full_size
+
+# ------------------------
+# Memory budget
+# ------------------------
+STRIP_ROWS = 256  # output rows per strip when building the working copy
+
+class MemoryBudgetExceeded(MemoryError):
+    """A source cannot be processed within the configured memory budget."""
+
+def image_bytes(size, mode="RGB") -> int:
+    """Approximate in-memory size of a Pillow image (RGB/RGBA/CMYK use 4 bytes per pixel)."""
+    w, h = size
+    if mode in ("1", "L", "P"):
+        per_pixel = 1
+    elif mode.startswith("I;16"):
+        per_pixel = 2
+    else:
+        per_pixel = 4
+    return w * h * per_pixel
+
+def output_bytes(W: int, H: int) -> int:
+    """Working set of one output: canvas, flattened/converted copy and encode buffer."""
+    return 3 * image_bytes((W, H), "RGBA")
+
+class MemoryPlan:
+    """Decode factor and concurrency that keep one source within a memory budget."""
+
+    def __init__(self, decode_factor: int, threads: int, peak: int):
+        self.decode_factor = decode_factor
+        self.threads = threads
+        self.peak = peak            # estimated peak bytes
+
+def plan_memory(img: Image.Image, targets, mode="cover", factor=1, budget=None, threads=1) -> MemoryPlan:
+    """
+    Choose how to decode an opened (not yet loaded) image under `budget` bytes.
+
+    Decode peak = decoded image + strip-built RGB working copy (+ its pyramid);
+    render peak = working copy + pyramid + one output working set per thread.
+    JPEGs may be decoded at a coarser DCT scale than the 2× oversampling rule
+    wants (down to 1× of the largest target). draft() only decodes at 1/1,
+    1/2, 1/4 or 1/8, so a factor of 3 is costed at 1/2. Other formats must
+    fit their full decoded size, since Pillow decodes them in one piece
+    before reduce().
+    Raises MemoryBudgetExceeded when no plan fits.
+    """
+    w, h = img.size
+    per_output = max((output_bytes(W, H) for (W, H) in targets), default=0)
+    is_jpeg = img.format in ("JPEG", "MPO")
+    max_factor = reduce_factor(w, h, targets, mode=mode, oversample=1) if targets else 1
+    candidates = [factor]
+    if is_jpeg:
+        candidates += [f for f in (2, 4, 8) if factor < f <= max_factor]
+    for f in candidates:
+        if is_jpeg:
+            scale = max(s for s in (1, 2, 4, 8) if s <= f)     # the DCT scale draft() decodes at
+            dw, dh = math.ceil(w / scale), math.ceil(h / scale)
+            decoded = image_bytes((dw, dh), "RGB")
+            working = image_bytes((dw, dh), "RGB") if img.mode != "RGB" else 0
+        else:
+            dw, dh = math.ceil(w / f), math.ceil(h / f)
+            decoded = image_bytes((w, h), img.mode)
+            working = image_bytes((dw, dh), "RGB") if f > 1 or img.mode != "RGB" else 0
+        src_bytes = working or decoded
+        pyramid = src_bytes // 3
+        decode_peak = decoded + working
+        render_base = src_bytes + pyramid
+        if decode_peak > budget or render_base + per_output > budget:
+            continue
+        n = max(1, min(threads, (budget - render_base) // per_output if per_output else threads))
+        return MemoryPlan(f, n, max(decode_peak, render_base + n * per_output))
+    raise MemoryBudgetExceeded(
+        f"{w}×{h} {img.mode} source needs more than {budget / 2**20:.0f} MiB "
+        f"(decoded alone: {image_bytes((w, h), img.mode) / 2**20:.0f} MiB)"
+    )
+
+def _reduced_strips(img: Image.Image, factor: int, conversion: ConversionPlan) -> Image.Image:
+    """
+    Working copy of img reduced by factor, converted strip by strip so no
+    full-size converted copy ever exists. Same pixels as conversion.working_copy().
+    """
+    w, h = img.size
+    out = Image.new(conversion.work_mode, (math.ceil(w / factor), math.ceil(h / factor)))
+    step = STRIP_ROWS * factor
+    for y in range(0, h, step):
+        strip = img.crop((0, y, w, min(h, y + step)))
+        out.paste(conversion.working_copy(strip, factor), (0, y // factor))
+        del strip
+    return out
+
+# ------------------------
+# Export
+# ------------------------
+# PNG encode profiles: zlib effort vs file size
+PNG_PROFILES = {
+    "fast": {"compress_level": 1},
+    "balanced": {"compress_level": 6},
+    "smallest": {"optimize": True},
+}
+
+class ExportCancelled(Exception):
+    """Raised by resize_for_platforms when its cancel event is set."""
+
+# Output formats: extension, keeps alpha, default quality, default effort (0 = fastest)
+FORMATS = {
+    "JPEG": ("jpg", False, 95, None),
+    "PNG": ("png", True, None, None),
+    "WEBP": ("webp", True, 85, 4),   # effort = WebP method (0-6)
+    "AVIF": ("avif", True, 60, 4),   # effort = 10 - AVIF speed (0-10)
+}
+FORMAT_ALIASES = {"JPG": "JPEG"}
+
+def export_formats(export_fmt) -> tuple:
+    """
+    "JPEG", "PNG", "Both" (= JPEG+PNG), any "+"/","-joined set such as
+    "JPEG+WEBP+AVIF", or a list of names -> tuple of FORMATS keys in the
+    given order. Raises ValueError for unknown or unavailable formats.
+    """
+    if isinstance(export_fmt, str):
+        names = export_fmt.replace(",", "+").split("+")
+    else:
+        names = list(export_fmt)
+    formats = []
+    for name in names:
+        name = name.strip().upper()
+        if name == "BOTH":
+            expanded = ["JPEG", "PNG"]
+        else:
+            expanded = [FORMAT_ALIASES.get(name, name)]
+        for fmt in expanded:
+            if fmt not in FORMATS:
+                raise ValueError(f"Unknown export format: {name}")
+            if fmt in ("WEBP", "AVIF") and not features.check(fmt.lower()):
+                raise ValueError(f"{fmt} encoding is not available in this Pillow build")
+            if fmt not in formats:
+                formats.append(fmt)
+    if not formats:
+        raise ValueError("No export format given")
+    return tuple(formats)
+
+def export_exts(export_fmt):
+    """[(format, extension), ...] written for export_fmt."""
+    return [(fmt, FORMATS[fmt][0]) for fmt in export_formats(export_fmt)]
+
+def encoder_params(fmt, quality=95, png_profile="smallest", format_options=None) -> dict:
+    """
+    Pillow save() keywords for one format. format_options maps a format to
+    {"quality": .., "effort": ..} overrides (JPEG uses `quality`, PNG the profile).
+    """
+    if fmt == "JPEG":
+        return dict(quality=quality, optimize=True, progressive=True)
+    if fmt == "PNG":
+        return dict(PNG_PROFILES[png_profile])
+    _, _, default_quality, default_effort = FORMATS[fmt]
+    opts = (format_options or {}).get(fmt, {})
+    q = int(opts.get("quality", default_quality))
+    effort = int(opts.get("effort", default_effort))
+    if fmt == "WEBP":
+        return dict(quality=q, method=max(0, min(6, effort)))
+    return dict(quality=q, speed=10 - max(0, min(10, effort)))
+
+def resolve_output_dir(output_dir: str) -> str:
+    """Output folder actually written to (reserved device names get an _out suffix)."""
+    if os.path.basename(os.path.normpath(output_dir)).upper() in RESERVED:
+        return output_dir + "_out"
+    return output_dir
+
+def output_filename(base_name: str, platform_key: str, ext: str) -> str:
+    """'<base>_<key>.<ext>', guarding against Windows reserved names."""
+    stem = f"{base_name}_{platform_key}"
+    if stem.upper() in RESERVED:
+        stem += "_img"
+    return f"{stem}.{ext}"
+
+def output_paths(input_file, output_dir, selection, export_fmt="JPEG"):
+    """
+    Planned output paths for one source: [(platform_key, (W,H), ext, path), ...]
+    in selection order, without touching the disk.
+    """
+    output_dir = resolve_output_dir(output_dir)
+    base_name = sanitize_basename(os.path.splitext(os.path.basename(input_file))[0])
+    return [
+        (platform_key, size, ext, os.path.join(output_dir, output_filename(base_name, platform_key, ext)))
+        for _, (platform_key, size) in selection
+        for _, ext in export_exts(export_fmt)
+    ]
+
+# Bump when the same settings start producing different pixels, so existing
+# OutputCache entries are re-keyed. 2: colour/mode planner (ICC -> sRGB, alpha
+# kept, 16-bit scaled), see plan_conversion.
+PIPELINE_VERSION = 2
+
+def cache_params(mode="cover", pad_exact=False, transparent_pad=False, bg_hex="#FFFFFF",
+                 export_fmt="JPEG", quality=95, pyramid=True, draft=True,
+                 png_profile="smallest", png_palette=False, memory_budget=None, strict=False,
+                 format_options=None, crop="center", color_manage=True, **_ignored):
+    """Every setting that affects output pixels/bytes, as used in OutputCache keys."""
+    params = {
+        "mode": mode, "pad_exact": bool(pad_exact), "transparent_pad": bool(transparent_pad),
+        "bg_hex": bg_hex.strip().lower(), "export_fmt": export_fmt, "quality": int(quality),
+        "pyramid": bool(pyramid), "draft": bool(draft),
+        "png_profile": png_profile, "png_palette": bool(png_palette), "strict": bool(strict),
+        "pipeline": PIPELINE_VERSION,
+    }
+    if memory_budget:  # can change the decode scale; unset keeps existing keys valid
+        params["memory_budget"] = int(memory_budget)
+    if mode == "cover" and crop != "center":
+        params["crop"] = crop
+    if not color_manage:
+        params["color_manage"] = False
+    for fmt in export_formats(export_fmt):
+        if fmt in ("WEBP", "AVIF"):
+            params[fmt.lower()] = encoder_params(fmt, format_options=format_options)
+    return params
+
+# ------------------------
+# Pillow plugins
+# ------------------------
+# Image.open() and save() fall back to Image.init(), which imports every Pillow
+# plugin (~40 modules), whenever a format's plugin is not loaded yet. Loading
+# just the ones a job needs keeps that cost off short-lived runs.
+PLUGINS = {
+    "JPEG": "JpegImagePlugin",
+    "PNG": "PngImagePlugin",
+    "WEBP": "WebPImagePlugin",
+    "AVIF": "AvifImagePlugin",
+    "TIFF": "TiffImagePlugin",
+    "BMP": "BmpImagePlugin",
+    "GIF": "GifImagePlugin",
+}
+SOURCE_FORMATS = {
+    ".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP", ".avif": "AVIF",
+    ".tif": "TIFF", ".tiff": "TIFF", ".bmp": "BMP", ".gif": "GIF",
+}
+
+def load_plugins(*formats):
+    """Import the Pillow plugins for these format names (unknown names are skipped)."""
+    for fmt in formats:
+        module = PLUGINS.get(fmt)
+        if module is None:
+            continue
+        try:
+            importlib.import_module(f"PIL.{module}")
+        except ImportError:
+            pass  # not in this Pillow: Image.init() still tries everything else
+
+def open_source(input_file, source=None):
+    """Image.open(input_file, or its prefetched bytes) with the plugin for its extension loaded."""
+    load_plugins(SOURCE_FORMATS.get(os.path.splitext(input_file)[1].lower()))
+    return Image.open(input_file if source is None else io.BytesIO(source))
+
+# ------------------------
+# Export pipeline
+# ------------------------
+def _save(img, path, fmt, metrics, target, writer=None, **params):
+    """
+    Encode to memory, then write: keeps encode and write timings separate.
+    With an AsyncWriter the write is only queued; returns its Future (else None).
+    Either way the file is replaced by a rename, never rewritten in place: an
+    output may be a hard link shared with another source's output (--dedupe).
+    """
+    with metrics.stage("encode", format=fmt, **target) as info:
+        buf = io.BytesIO()
+        img.save(buf, fmt, **params)
+        info["bytes"] = buf.tell()
+    if writer is not None:
+        return writer.write(path, buf.getvalue(), metrics=metrics, **target)
+    from social_resizer_io import atomic_write
+    with metrics.stage("write", path=path, bytes=buf.tell(), **target):
+        atomic_write(path, buf.getbuffer())
+
+def resize_for_platforms(
+    input_file,
+    output_dir,
+    selection,
+    mode="cover",                 # "cover" or "contain"
+    pad_exact=False,              # only for contain
+    transparent_pad=False,        # only for contain+pad and formats with alpha (PNG, WebP, AVIF)
+    bg_hex="#FFFFFF",
+    export_fmt="JPEG",            # "JPEG", "PNG", "Both" or a set like "JPEG+WEBP+AVIF"
+    quality=95,
+    logger=None,
+    pyramid=True,                 # resample from a shared downscale pyramid
+    draft=True,                   # decode at the smallest scale that oversamples every target
+    cache=None,                   # OutputCache: skip outputs whose key is unchanged
+    progress=None,                # callback(done, total) after each size
+    cancel=None,                  # threading.Event: stop at the next size boundary
+    threads=1,                    # >1: resample/encode sizes concurrently (same bytes)
+    metrics=None,                 # StageMetrics (or any object with .stage()): per-stage events
+    png_profile="smallest",       # "fast", "balanced", "smallest" (see PNG_PROFILES)
+    png_palette=False,            # letterboxed PNGs as 8-bit palette images (lossy, opt-in)
+    memory_budget=None,           # bytes: bound peak memory per call (see plan_memory)
+    strict=False,                 # resample every cover size directly (no derived outputs)
+    source=None,                  # prefetched bytes of input_file (decoded instead of the path)
+    writer=None,                  # AsyncWriter: queue outputs instead of writing them inline
+    format_options=None,          # {"WEBP": {"quality": 85, "effort": 4}, "AVIF": {...}}
+    crop="center",                # cover crop placement: "center" or a CROP_METHODS saliency method
+    color_manage=True,            # convert embedded ICC profiles to sRGB (see plan_conversion)
+):
+    """Export one source to every (label, (key, (W,H))) in selection; returns saved paths."""
+    def log(msg):
+        (logger or print)(msg)
+
+    saved = []
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_dir = resolve_output_dir(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    planned = output_paths(input_file, output_dir, selection, export_fmt)
+    keys = {}
+    if cache is not None:
+        digest = cache.source_digest(input_file)
+        params = cache_params(mode, pad_exact, transparent_pad, bg_hex, export_fmt, quality, pyramid, draft,
+                              png_profile, png_palette, memory_budget, strict, format_options, crop,
+                              color_manage)
+        stale = set()
+        for platform_key, size, ext, path in planned:
+            keys[path] = cache.output_key(digest, platform_key, size, ext, params)
+            if cache.is_fresh(path, keys[path]):
+                log(f"Cached: {path}")
+            else:
+                stale.add(platform_key)
+        selection = [entry for entry in selection if entry[1][0] in stale]
+        if not selection:
+            log("Done! ✅ (all outputs up to date)")
+            return saved
+    paths = {(platform_key, ext): path for platform_key, _, ext, path in planned}
+    writes = {}                   # output path -> Future of a queued write (writer only)
+
+    if png_profile not in PNG_PROFILES:
+        raise ValueError(f"Unknown PNG profile: {png_profile}")
+    smart_crop = mode == "cover" and crop != "center"
+    if smart_crop:
+        from social_resizer_crop import CROP_METHODS, crop_anchors, source_id
+        if crop not in CROP_METHODS:
+            raise ValueError(f"Unknown crop method: {crop}")
+    formats = export_formats(export_fmt)
+    load_plugins(*formats)
+    encoders = {fmt: encoder_params(fmt, quality, png_profile, format_options) for fmt in formats}
+    # a transparent pad survives in every format that has alpha; JPEG is flattened
+    transparent = transparent_pad and any(FORMATS[fmt][1] for fmt in formats)
+    metrics = metrics or NULL_METRICS
+    with metrics.stage("open", source=input_file) as info:
+        img = open_source(input_file, source)
+        info.update(source_size=img.size, format=img.format, mode=img.mode)
+    with img:
+        bg_rgb = hex_to_rgb(bg_hex)
+        targets = [size for _, (_, size) in selection]
+        oversample = PYRAMID_OVERSAMPLE if pyramid else 0
+        decode_oversample = PYRAMID_OVERSAMPLE if draft else 0
+        factor = reduce_factor(*img.size, targets, mode=mode, oversample=decode_oversample)
+        if memory_budget:
+            threads = plan_memory(img, targets, mode, factor, memory_budget, threads).threads
+        # one conversion per source to sRGB RGB/RGBA, at the working copy or (late) per output
+        conversion = plan_conversion(img, targets, mode, factor, color_manage)
+        # draft=False decodes at full resolution
+        src, full_size = decode_source(img, targets, mode=mode, metrics=metrics, oversample=decode_oversample,
+                                       memory_budget=memory_budget, conversion=conversion)
+        if src is not img:
+            img.close()  # release the decoded source as soon as the working copy exists
+        anchors = None
+        if smart_crop:
+            with metrics.stage("saliency", method=crop, source_size=full_size) as info:
+                anchors = crop_anchors(src, full_size, targets, crop, source_id(input_file))
+                info["moved"] = len(anchors)
+        with metrics.stage("pyramid", source_size=full_size) as info:
+            plan = ResamplePlan(src, targets, mode=mode, oversample=oversample, full_size=full_size,
+                                lean=bool(memory_budget), derive_loss=None if strict else DERIVE_MAX_LOSS,
+                                anchors=anchors)
+            info["levels"] = sorted(plan.levels)
+
+        def render(platform_key, W, H):
+            """Resample and encode one size; returns the paths written (None if cancelled)."""
+            if cancel is not None and cancel.is_set():
+                return None
+            written = []
+            target = {"target": platform_key, "target_size": (W, H), "pixels": W * H}
+            # Produce the base output image according to mode
+            with metrics.stage("resample", mode=mode, source_size=full_size, **target) as info:
+                if mode == "cover":
+                    out = plan.cover(W, H)
+                else:
+                    out = plan.contain(W, H)
+                if (W, H) in plan.derived:
+                    info["derived_from"] = plan.derived[(W, H)]
+            if conversion.late:
+                with metrics.stage("convert", mode=out.mode, to=conversion.out_mode, **target):
+                    out = conversion.finish(out)
+            resized = out
+            letterboxed = mode != "cover" and pad_exact
+            if letterboxed:
+                with metrics.stage("letterbox", **target):
+                    out = letterbox_canvas(out, W, H, transparent=transparent, bg_rgb=bg_rgb)
+            # else: contain output may be smaller than (W,H)
+
+            # One encode per chosen format, all from the same resampled image
+            encodes = []                    # (format, image, path, save params)
+            for fmt in formats:
+                params = dict(encoders[fmt])
+                if fmt == "JPEG":
+                    with metrics.stage("flatten", **target):
+                        if letterboxed and transparent:  # same pixels as flattening the RGBA canvas
+                            image = letterbox_canvas(resized, W, H, transparent=False, bg_rgb=bg_rgb)
+                        else:
+                            image = flatten_if_needed(out, bg_rgb=bg_rgb)
+                elif fmt == "PNG" and png_palette and letterboxed and resized.size != (W, H):
+                    with metrics.stage("quantize", **target):
+                        image, extra = palette_letterbox(resized, W, H, transparent_pad, bg_rgb)
+                    params.update(extra)
+                else:
+                    image = out if out.mode in ("RGB", "RGBA") else out.convert("RGBA")
+                encodes.append((fmt, image, paths[(platform_key, FORMATS[fmt][0])], params))
+            if encode_pool is not None and len(encodes) > 1:
+                # Image.save() keeps its params on the image while encoding, so
+                # formats encoded at the same time must not share an Image object
+                pending, used = [], set()
+                for fmt, image, path, params in encodes:
+                    if id(image) in used:
+                        image = image.copy()
+                    used.add(id(image))
+                    pending.append(encode_pool.submit(_save, image, path, fmt, metrics, target, writer, **params))
+                queued = [f.result() for f in pending]
+            else:
+                queued = [_save(image, path, fmt, metrics, target, writer, **params)
+                          for fmt, image, path, params in encodes]
+            for (_, _, path, _), write in zip(encodes, queued):
+                writes[path] = write
+                written.append(path)
+            return written
+
+        # Pillow releases the GIL while resampling and encoding, so sizes can be
+        # fanned out to threads; results are consumed in selection order either way.
+        jobs = [(platform_key, W, H) for _, (platform_key, (W, H)) in selection]
+        pool = None
+        if threads > 1:  # single-threaded runs never import concurrent.futures
+            from concurrent.futures import ThreadPoolExecutor
+        # formats of one size are encoded concurrently on their own pool (a
+        # render waiting on its encodes must not occupy the pool they need)
+        encode_pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 and len(formats) > 1 else None
+        if threads > 1 and len(jobs) > 1:
+            pool = ThreadPoolExecutor(max_workers=min(threads, len(jobs)))
+            futures = [pool.submit(render, *job) for job in jobs]
+            results = (f.result() for f in futures)
+        else:
+            results = (render(*job) for job in jobs)
+        done = 0
+        try:
+            for written in results:
+                if written is None:
+                    continue
+                for path in written:
+                    saved.append(path)
+                    log(f"Saved: {path}")
+                done += 1
+                if progress is not None:
+                    progress(done, len(jobs))
+        finally:
+            if pool is not None:
+                for f in futures:
+                    f.cancel()
+                pool.shutdown(wait=True)
+            if encode_pool is not None:
+                encode_pool.shutdown(wait=True)
+            if cache is not None:
+                for path in saved:
+                    if writes.get(path) is None:
+                        cache.record(path, keys[path], input_file, digest)
+                    else:  # queued: record once the file is actually in place
+                        writes[path].add_done_callback(
+                            lambda f, path=path: f.exception() is None
+                            and cache.record(path, keys[path], input_file, digest))
+
+        if done < len(jobs):
+            raise ExportCancelled(f"Cancelled after {done} of {len(jobs)} sizes")
+        log("Done! ✅")
+    return saved
@@ -0,0 +1,211 @@
+"""
+SocialResizer — duplicate-source detection.
+Drop folders often hold the same asset under several names. Before a batch
+renders anything, find_duplicates groups its sources:
+
+- exact:      identical bytes (SHA-256, only for files whose sizes collide)
+- perceptual: optional; a 64-bit difference hash of a small reduced decode,
+              so re-saves (other quality, format or resolution) match too
+
+Only one source per group is rendered; the other sources get that source's
+outputs hard-linked (or copied) under their own names. Perceptual matches
+also need the same aspect ratio, alpha and a close mean colour, so a crop,
+a cut-out or a recoloured variant is never taken for a re-save.
+"""
+
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass
+
+from PIL import Image
+
+from social_resizer_cache import file_digest
+from social_resizer_core import open_source
+
+HASH_SIDE = 8               # difference hash of a (HASH_SIDE+1) x HASH_SIDE grayscale thumbnail
+MAX_DISTANCE = 5            # perceptual matches differ in at most this many of the 64 hash bits
+ASPECT_TOLERANCE = 0.01     # perceptual matches differ in aspect ratio by at most 1%
+FLAT_LEVELS = 1.0           # neighbouring cells closer than this (gray levels) count as equal
+COLOR_TOLERANCE = 24        # ... and in mean colour by at most this much per channel (0-255)
+
+@dataclass(frozen=True)
+class Duplicate:
+    source: str             # the file that is not rendered
+    original: str           # the file whose outputs it reuses
+    kind: str               # "exact" or "perceptual"
+    distance: int = 0       # hash bits that differ (perceptual)
+
+# ------------------------
+# Hashes
+# ------------------------
+def perceptual_hash(path: str):
+    """(64-bit difference hash, (width, height), has alpha, mean RGB) from a reduced decode."""
+    with open_source(path) as img:
+        size = img.size
+        alpha = "A" in img.getbands() or "transparency" in img.info
+        img.draft("RGB", (HASH_SIDE * 8, HASH_SIDE * 8))   # JPEG: decode at 1/2 to 1/8 scale
+        factor = min(img.width // (HASH_SIDE * 8), img.height // (HASH_SIDE * 8))
+        if factor > 1 and img.mode in ("L", "LA", "RGB", "RGBA", "CMYK"):
+            img = img.reduce(factor)
+        img = img.convert("RGB")
+    # float cell means, so re-encoding noise does not flip flat areas
+    gray = img.convert("L").convert("F").resize((HASH_SIDE + 1, HASH_SIDE), Image.Resampling.BOX)
+    color = img.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    value = 0
+    for y in range(HASH_SIDE):
+        row = [gray.getpixel((x, y)) for x in range(HASH_SIDE + 1)]
+        for x in range(HASH_SIDE):
+            value = value << 1 | (row[x] > row[x + 1] + FLAT_LEVELS)
+    return value, size, alpha, color
+
+def _similar(a, b, max_distance):
+    """Hash distance if two perceptual_hash results are re-saves of each other, else None."""
+    (ha, (wa, ha_h), alpha_a, color_a), (hb, (wb, hb_h), alpha_b, color_b) = a, b
+    if alpha_a != alpha_b or abs(wa / ha_h - wb / hb_h) > ASPECT_TOLERANCE * wa / ha_h:
+        return None
+    if max(abs(x - y) for x, y in zip(color_a, color_b)) > COLOR_TOLERANCE:
+        return None
+    distance = bin(ha ^ hb).count("1")
+    return distance if distance <= max_distance else None
+
+def _bucket_keys(result, max_distance, neighbours=False):
+    """
+    Index keys of a perceptual_hash result: (alpha, aspect band, hash slice).
+    The hash is cut into max_distance+1 slices, so two hashes at most
+    max_distance bits apart agree exactly on at least one of them; aspect
+    bands are ASPECT_TOLERANCE wide, so a match is in the same or a
+    neighbouring band.
+    """
+    value, (w, h), alpha, _ = result
+    bits = HASH_SIDE * HASH_SIDE
+    parts = min(bits, max_distance + 1)
+    band = math.floor(math.log(w / h) / -math.log1p(-ASPECT_TOLERANCE))
+    bands = (band - 1, band, band + 1) if neighbours else (band,)
+    keys = []
+    for i in range(parts):
+        lo, hi = i * bits // parts, (i + 1) * bits // parts
+        part = value >> lo & ((1 << (hi - lo)) - 1)
+        keys += [(alpha, b, i, part) for b in bands]
+    return keys
+
+# ------------------------
+# Grouping
+# ------------------------
+def find_duplicates(files, perceptual=False, max_distance=MAX_DISTANCE, digest=file_digest, logger=None):
+    """
+    Split files into (unique files in input order, [Duplicate, ...]).
+    `digest` hashes one file's bytes (e.g. OutputCache.source_digest, which is
+    memoized). Among perceptual matches the largest source is kept.
+    """
+    def log(msg):
+        (logger or print)(msg)
+
+    files = list(files)
+    by_size = {}
+    for f in files:
+        try:
+            by_size.setdefault(os.path.getsize(f), []).append(f)
+        except OSError:
+            pass                            # reported when the batch opens it
+    duplicates = {}                         # duplicate -> Duplicate
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        first = {}
+        for f in group:
+            try:
+                d = digest(f)
+            except OSError:
+                continue
+            if d in first:
+                duplicates[f] = Duplicate(f, first[d], "exact")
+            else:
+                first[d] = f
+
+    if perceptual:
+        hashes = {}
+        for f in files:
+            if f in duplicates:
+                continue
+            try:
+                hashes[f] = perceptual_hash(f)
+            except Exception as e:          # broken files are left to the batch
+                log(f"Dedupe: cannot hash {f} ({type(e).__name__}: {e})")
+        groups = []                         # each is compared through its first member
+        index = {}                          # _bucket_keys of a group's first member -> group numbers
+        for f, h in hashes.items():
+            candidates = set()
+            for key in _bucket_keys(h, max_distance, neighbours=True):
+                candidates.update(index.get(key, ()))
+            for n in sorted(candidates):    # earliest matching group, as a full scan would pick
+                if _similar(hashes[groups[n][0]], h, max_distance) is not None:
+                    groups[n].append(f)
+                    break
+            else:
+                for key in _bucket_keys(h, max_distance):
+                    index.setdefault(key, []).append(len(groups))
+                groups.append([f])
+        for group in groups:
+            keep = max(group, key=lambda f: hashes[f][1][0] * hashes[f][1][1])
+            for f in group:
+                if f != keep:
+                    distance = bin(hashes[f][0] ^ hashes[keep][0]).count("1")
+                    duplicates[f] = Duplicate(f, keep, "perceptual", distance)
+        # exact copies of a file that became a perceptual duplicate follow it
+        for f, dup in list(duplicates.items()):
+            if dup.kind == "exact" and dup.original in duplicates:
+                duplicates[f] = Duplicate(f, duplicates[dup.original].original, "exact")
+
+    unique = [f for f in files if f not in duplicates]
+    return unique, [duplicates[f] for f in files if f in duplicates]
+
+# ------------------------
+# Outputs
+# ------------------------
+def link_output(src: str, dst: str, mode="hard") -> str:
+    """
+    Make dst a hard link to (or copy of) src, replacing dst atomically.
+    Hard links fall back to a copy across filesystems; a copy gets src's
+    permission bits (not the temporary file's 0600). Returns the mode used.
+    """
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return mode
+    folder, name = os.path.split(dst)
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder or ".")
+    os.close(fd)
+    try:
+        used = mode
+        if mode == "hard":
+            os.remove(tmp)
+            try:
+                os.link(src, tmp)
+            except OSError:
+                used = "copy"
+        if used == "copy":
+            shutil.copyfile(src, tmp)
+            shutil.copymode(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return used
+
+def reuse_outputs(dup: Duplicate, plan, mode="hard"):
+    """Link the original's outputs under the duplicate's names; returns the new paths."""
+    made = []
+    for (_, _, _, src), (_, _, _, dst) in zip(plan.output_paths(dup.original), plan.output_paths(dup.source)):
+        link_output(src, dst, mode)
+        made.append(dst)
+    return made
+
+def report_dict(duplicates, outputs=None) -> dict:
+    """JSON-ready dedupe report: every duplicate with its original and reused outputs."""
+    outputs = outputs or {}
+    return {
+        "duplicates": [dict(asdict(d), outputs=outputs.get(d.source, [])) for d in duplicates],
+        "exact": sum(d.kind == "exact" for d in duplicates),
+        "perceptual": sum(d.kind == "perceptual" for d in duplicates),
+    }
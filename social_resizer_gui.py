@@ -3,150 +3,26 @@ SocialResizer — One-click, on-spec, on-brand.
 GUI tool to batch-create social-ready images with cover/contain modes,
 optional letterboxing (solid color or transparency), export as JPEG/PNG/Both,
 preset bundles (Instagram, LinkedIn, etc.), and custom sizes.
+The processing itself lives in social_resizer_core.
 
 Author: You + ChatGPT
 """
 
 import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-from PIL import Image
-
-# ------------------------
-# Canonical sizes (pixels)
-# ------------------------
-SIZES = {
-    "Instagram Post (1080×1080)": ("instagram_post", (1080, 1080)),
-    "Instagram Portrait 4:5 (1080×1350)": ("instagram_portrait", (1080, 1350)),
-    "Instagram Story/Reel (1080×1920)": ("instagram_story", (1080, 1920)),
-    "Facebook Post (1200×630)": ("facebook_post", (1200, 630)),
-    "LinkedIn Post (1200×627)": ("linkedin_post", (1200, 627)),
-    "X/Twitter Post (1600×900)": ("twitter_post", (1600, 900)),
-    "YouTube Thumbnail (1280×720)": ("youtube_thumb", (1280, 720)),
-    "Landscape 16:9 (1920×1080)": ("landscape_16_9", (1920, 1080)),
-    "Pinterest Tall (1000×1500)": ("pinterest_tall", (1000, 1500)),
-}
-
-# ------------------------
-# Preset bundles/profiles
-# ------------------------
-PRESETS = {
-    "-- Choose preset --": [],
-    "Instagram – All": [
-        "Instagram Post (1080×1080)",
-        "Instagram Portrait 4:5 (1080×1350)",
-        "Instagram Story/Reel (1080×1920)",
-    ],
-    "Instagram – Feed Only": [
-        "Instagram Post (1080×1080)",
-        "Instagram Portrait 4:5 (1080×1350)",
-    ],
-    "Stories/Reels": [
-        "Instagram Story/Reel (1080×1920)",
-    ],
-    "LinkedIn – Post": [
-        "LinkedIn Post (1200×627)",
-    ],
-    "Facebook – Post": [
-        "Facebook Post (1200×630)",
-    ],
-    "X/Twitter – Post": [
-        "X/Twitter Post (1600×900)",
-    ],
-    # Paid ads oriented bundles
-    "Meta Ads (IG+FB)": [
-        "Instagram Post (1080×1080)",
-        "Instagram Portrait 4:5 (1080×1350)",
-        "Landscape 16:9 (1920×1080)",
-    ],
-    "LinkedIn Ads": [
-        "LinkedIn Post (1200×627)",   # 1.91:1
-        "Landscape 16:9 (1920×1080)",
-    ],
-    "YouTube – Thumbnail": [
-        "YouTube Thumbnail (1280×720)",
-    ],
-    "All Platforms": list(SIZES.keys()),
-}
-
-# ------------------------
-# Windows reserved names
-# ------------------------
-RESERVED = {
-    "CON","PRN","AUX","NUL",
-    "COM1","COM2","COM3","COM4","COM5","COM6","COM7","COM8","COM9",
-    "LPT1","LPT2","LPT3","LPT4","LPT5","LPT6","LPT7","LPT8","LPT9",
-}
-
-def sanitize_basename(name: str) -> str:
-    """Ensure safe Windows filename base (no reserved device names)."""
-    base = name.strip().rstrip(". ")
-    if base.upper() in RESERVED:
-        base = f"{base}_img"
-    return base
-
-def hex_to_rgb(hx: str):
-    """#RRGGBB -> (R,G,B). Gracefully fallback to white."""
-    try:
-        hx = hx.strip().lstrip("#")
-        if len(hx) == 3:  # e.g., #fff
-            hx = "".join(c*2 for c in hx)
-        r = int(hx[0:2], 16)
-        g = int(hx[2:4], 16)
-        b = int(hx[4:6], 16)
-        return (r, g, b)
-    except Exception:
-        return (255, 255, 255)
-
-def cover_resize(src: Image.Image, W: int, H: int) -> Image.Image:
-    """Fill target (COVER): crop overflow, then resize exactly to (W,H)."""
-    src_ratio = src.width / src.height
-    target_ratio = W / H
-    if src_ratio > target_ratio:
-        # Crop width
-        new_height = src.height
-        new_width = int(target_ratio * new_height)
-    else:
-        # Crop height
-        new_width = src.width
-        new_height = int(new_width / target_ratio)
-    left = (src.width - new_width) // 2
-    top = (src.height - new_height) // 2
-    crop = src.crop((left, top, left + new_width, top + new_height))
-    return crop.resize((W, H), Image.Resampling.LANCZOS)
-
-def contain_resize(src: Image.Image, W: int, H: int) -> Image.Image:
-    """Fit inside (CONTAIN): keep aspect ratio; result <= (W,H)."""
-    out = src.copy()
-    out.thumbnail((W, H), Image.Resampling.LANCZOS)
-    return out
-
-def letterbox_canvas(resized: Image.Image, W: int, H: int, transparent: bool, bg_rgb=(255,255,255)):
-    """
-    Center 'resized' on an exact WxH canvas.
-    If transparent=True -> RGBA canvas; else RGB canvas filled with bg_rgb.
-    """
-    if transparent:
-        canvas = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-    else:
-        canvas = Image.new("RGB", (W, H), bg_rgb)
-    x = (W - resized.width) // 2
-    y = (H - resized.height) // 2
-    if transparent and resized.mode != "RGBA":
-        resized = resized.convert("RGBA")
-    canvas.paste(resized, (x, y), resized if resized.mode == "RGBA" else None)
-    return canvas
-
-def flatten_if_needed(img: Image.Image, bg_rgb=(255,255,255)) -> Image.Image:
-    """Ensure no alpha when saving to JPEG (composite on bg if needed)."""
-    if img.mode in ("RGBA", "LA"):
-        bg = Image.new("RGB", img.size, bg_rgb)
-        bg.paste(img, mask=img.split()[-1])  # use alpha channel as mask
-        return bg
-    if img.mode != "RGB":
-        return img.convert("RGB")
-    return img
+
+from PIL import ImageTk
+
+from social_resizer_core import PNG_PROFILES, ExportCancelled, export_formats
+from social_resizer_crop import CROP_METHODS
+from social_resizer_preview import PREVIEW_SIDE, render_preview
+from social_resizer_registry import Registry, default_registry
 
 def resource_path(relative_path: str) -> str:
     """
@@ -158,67 +34,25 @@ def resource_path(relative_path: str) -> str:
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def resize_for_platforms(
-    input_file,
-    output_dir,
-    selection,
-    mode="cover",                 # "cover" or "contain"
-    pad_exact=False,              # only for contain
-    transparent_pad=False,        # only for contain+pad and PNG
-    bg_hex="#FFFFFF",
-    export_fmt="JPEG",            # "JPEG", "PNG", "Both"
-    quality=95,
-    logger=None
-):
-    def log(msg):
-        (logger or print)(msg)
-
-    os.makedirs(output_dir, exist_ok=True)
-    if os.path.basename(os.path.normpath(output_dir)).upper() in RESERVED:
-        output_dir = output_dir + "_out"
-        os.makedirs(output_dir, exist_ok=True)
-
-    with Image.open(input_file) as img:
-        src = img.convert("RGB")  # canonical working mode
-        base_name = sanitize_basename(os.path.splitext(os.path.basename(input_file))[0])
-        bg_rgb = hex_to_rgb(bg_hex)
-
-        for label, (platform_key, (W, H)) in selection:
-            # Produce the base output image according to mode
-            if mode == "cover":
-                out = cover_resize(src, W, H)
-            else:
-                resized = contain_resize(src, W, H)
-                if pad_exact:
-                    out = letterbox_canvas(
-                        resized, W, H,
-                        transparent=(transparent_pad and (export_fmt in ("PNG", "Both"))),
-                        bg_rgb=bg_rgb
-                    )
-                else:
-                    out = resized  # may be smaller than (W,H)
-
-            # Save in chosen format(s)
-            if export_fmt in ("JPEG", "Both"):
-                out_jpg = flatten_if_needed(out, bg_rgb=bg_rgb)
-                jpg_name = f"{base_name}_{platform_key}.jpg"
-                if os.path.splitext(jpg_name)[0].upper() in RESERVED:
-                    jpg_name = os.path.splitext(jpg_name)[0] + "_img.jpg"
-                out_jpg.save(os.path.join(output_dir, jpg_name), "JPEG",
-                             quality=quality, optimize=True, progressive=True)
-                log(f"Saved: {os.path.join(output_dir, jpg_name)}")
-
-            if export_fmt in ("PNG", "Both"):
-                out_png = out if out.mode in ("RGB", "RGBA") else out.convert("RGBA")
-                png_name = f"{base_name}_{platform_key}.png"
-                if os.path.splitext(png_name)[0].upper() in RESERVED:
-                    png_name = os.path.splitext(png_name)[0] + "_img.png"
-                out_png.save(os.path.join(output_dir, png_name), "PNG", optimize=True)
-                log(f"Saved: {os.path.join(output_dir, png_name)}")
-
-        log("Done! ✅")
+# Export choices offered by the GUI (unavailable encoders are hidden)
+GUI_FORMATS = ["JPEG", "PNG", "Both", "WEBP", "AVIF", "JPEG+WEBP", "JPEG+WEBP+AVIF"]
+
+def available_formats(choices=GUI_FORMATS):
+    """The entries of choices this Pillow build can encode."""
+    available = []
+    for choice in choices:
+        try:
+            export_formats(choice)
+        except ValueError:
+            continue
+        available.append(choice)
+    return available
 
 class App(tk.Tk):
+    POLL_MS = 50  # how often queued log/progress events are drained
+    PREVIEW_POLL_MS = 10  # ... and while a preview is being rendered
+    PREVIEW_BURST_MS = 50  # changes this soon after a preview render are coalesced into one more
+
     def __init__(self):
         super().__init__()
         self.title("SocialResizer")
@@ -239,20 +73,52 @@ class App(tk.Tk):
 
         # Mode: "cover" or "contain"
         self.mode = tk.StringVar(value="cover")
+        self.crop = tk.StringVar(value="center")          # cover crop placement (CROP_METHODS)
         self.pad_exact = tk.BooleanVar(value=True)         # only for contain
         self.transparent_pad = tk.BooleanVar(value=False)  # PNG letterbox transparency
         self.bg_color = tk.StringVar(value="#FFFFFF")      # letterbox color
 
         self.quality = tk.IntVar(value=95)                 # JPEG quality
-        self.export_fmt = tk.StringVar(value="JPEG")       # "JPEG", "PNG", "Both"
+        self.export_fmt = tk.StringVar(value="JPEG")       # a GUI_FORMATS entry
+        self.png_profile = tk.StringVar(value="smallest")  # see PNG_PROFILES
+        self.png_palette = tk.BooleanVar(value=False)      # palette PNG for letterbox
+
+        # Sizes and presets: built-ins plus $SOCIALRESIZER_REGISTRY
+        try:
+            self.registry = default_registry()
+            registry_error = None
+        except (OSError, ValueError) as e:
+            self.registry, registry_error = Registry(), e
 
         # Platform checkboxes
-        self.platform_vars = {label: tk.BooleanVar(value=False) for label in SIZES.keys()}
+        self.platform_vars = {label: tk.BooleanVar(value=False) for label in self.registry.sizes}
 
-        # Custom sizes: label -> (key, (W,H))
+        # Custom sizes: label -> (key, (W,H)); also added to the registry for this session
         self.custom_sizes = {}
 
+        # Background export: worker thread -> UI via a queue drained by after()
+        self._events = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        self._cancel = threading.Event()
+        self._busy = False
+        self._started = 0.0
+
+        # Live preview: rendered from a low-res proxy on its own thread, newest request wins
+        self._preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+        self._preview_after = None
+        self._preview_dirty = False    # settings changed since the last preview render started
+        self._preview_pending = False  # a render is running; drain its result quickly
+        self._preview_generation = 0
+        self._preview_images = []  # PhotoImages must stay referenced while shown
+
         self._build_ui()
+        for var in (self.input_path, self.mode, self.crop, self.pad_exact, self.transparent_pad,
+                    self.bg_color, self.export_fmt, *self.platform_vars.values()):
+            var.trace_add("write", self._schedule_preview)
+        if registry_error is not None:
+            self.log(f"Registry not loaded ({registry_error}); using built-in sizes.")
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._drain_after = self.after(self.POLL_MS, self._drain_events)
 
     # ---------- UI construction ----------
     def _build_ui(self):
@@ -277,7 +143,7 @@ class App(tk.Tk):
         frm_presets.pack(fill="x", **pad)
         inner = ttk.Frame(frm_presets); inner.pack(fill="x", padx=10, pady=8)
         self.preset_var = tk.StringVar(value="-- Choose preset --")
-        self.preset_cb = ttk.Combobox(inner, textvariable=self.preset_var, values=list(PRESETS.keys()), state="readonly")
+        self.preset_cb = ttk.Combobox(inner, textvariable=self.preset_var, values=list(self.registry.presets), state="readonly")
         self.preset_cb.pack(side="left", fill="x", expand=True)
         ttk.Button(inner, text="Apply preset", command=self.apply_preset).pack(side="left", padx=8)
 
@@ -315,11 +181,13 @@ class App(tk.Tk):
         ttk.Label(row_mode, text="Mode:").pack(side="left")
         ttk.Radiobutton(row_mode, text="Cover (crop to fill)", variable=self.mode, value="cover").pack(side="left", padx=10)
         ttk.Radiobutton(row_mode, text="Contain (keep aspect)", variable=self.mode, value="contain").pack(side="left", padx=10)
+        ttk.Label(row_mode, text="Crop focus:").pack(side="left", padx=(20, 0))
+        ttk.Combobox(row_mode, textvariable=self.crop, values=list(CROP_METHODS), state="readonly", width=9).pack(side="left", padx=8)
 
         # Letterbox options (effective for contain)
         row_lb = ttk.Frame(frm_opts); row_lb.pack(fill="x", padx=10, pady=6)
         ttk.Checkbutton(row_lb, text="Pad to exact size (letterbox)", variable=self.pad_exact).pack(side="left")
-        ttk.Checkbutton(row_lb, text="Transparent pad (PNG only)", variable=self.transparent_pad).pack(side="left", padx=10)
+        ttk.Checkbutton(row_lb, text="Transparent pad (PNG/WebP/AVIF)", variable=self.transparent_pad).pack(side="left", padx=10)
 
         # Background color picker
         row_bg = ttk.Frame(frm_opts); row_bg.pack(fill="x", padx=10, pady=6)
@@ -331,14 +199,36 @@ class App(tk.Tk):
         # Export options
         row_exp = ttk.Frame(frm_opts); row_exp.pack(fill="x", padx=10, pady=6)
         ttk.Label(row_exp, text="Export format:").pack(side="left")
-        ttk.Combobox(row_exp, textvariable=self.export_fmt, values=["JPEG", "PNG", "Both"], state="readonly", width=8).pack(side="left", padx=8)
+        ttk.Combobox(row_exp, textvariable=self.export_fmt, values=available_formats(), state="readonly", width=14).pack(side="left", padx=8)
         ttk.Label(row_exp, text="JPEG quality:").pack(side="left", padx=10)
         ttk.Scale(row_exp, from_=60, to=100, orient="horizontal", variable=self.quality).pack(side="left", fill="x", expand=True, padx=8)
         ttk.Label(row_exp, textvariable=self.quality).pack(side="left")
 
+        # PNG compression
+        row_png = ttk.Frame(frm_opts); row_png.pack(fill="x", padx=10, pady=6)
+        ttk.Label(row_png, text="PNG compression:").pack(side="left")
+        ttk.Combobox(row_png, textvariable=self.png_profile, values=list(PNG_PROFILES), state="readonly", width=10).pack(side="left", padx=8)
+        ttk.Checkbutton(row_png, text="Palette PNG for letterbox (smaller, lossy)", variable=self.png_palette).pack(side="left", padx=10)
+
         # Run & log
         run_frame = ttk.Frame(self); run_frame.pack(fill="x", **pad)
-        ttk.Button(run_frame, text="Run", command=self.run).pack(side="right")
+        self.run_btn = ttk.Button(run_frame, text="Run", command=self.run)
+        self.run_btn.pack(side="right")
+        self.cancel_btn = ttk.Button(run_frame, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_btn.pack(side="right", padx=6)
+        self.progress = ttk.Progressbar(run_frame, orient="horizontal", mode="determinate")
+        self.progress.pack(side="left", fill="x", expand=True)
+        self.eta_var = tk.StringVar(value="")
+        ttk.Label(run_frame, textvariable=self.eta_var, width=18).pack(side="left", padx=8)
+
+        # Preview
+        frm_preview = ttk.LabelFrame(self, text="Preview")
+        frm_preview.pack(fill="x", **pad)
+        self.preview_canvas = tk.Canvas(frm_preview, height=PREVIEW_SIDE + 40, highlightthickness=0)
+        self.preview_canvas.pack(fill="x", padx=10, pady=(6, 0))
+        preview_scroll = ttk.Scrollbar(frm_preview, orient="horizontal", command=self.preview_canvas.xview)
+        preview_scroll.pack(fill="x", padx=10, pady=(0, 6))
+        self.preview_canvas.configure(xscrollcommand=preview_scroll.set)
 
         log_frame = ttk.LabelFrame(self, text="Log")
         log_frame.pack(fill="both", expand=True, **pad)
@@ -354,7 +244,7 @@ class App(tk.Tk):
         for w in self.platform_container_right.winfo_children():
             w.destroy()
         # Combine standard + custom
-        labels = list(SIZES.keys()) + list(self.custom_sizes.keys())
+        labels = list(self.registry.sizes)
         labels.sort()
         half = (len(labels) + 1) // 2
         for lbl in labels[:half]:
@@ -396,12 +286,20 @@ class App(tk.Tk):
 
     def apply_preset(self):
         preset = self.preset_var.get()
-        if preset not in PRESETS:
+        if preset not in self.registry.presets:
             return
         self.deselect_all()
-        for lbl in PRESETS[preset]:
+        for lbl in self.registry.presets[preset]:
             if lbl in self.platform_vars:
                 self.platform_vars[lbl].set(True)
+        # Export settings the preset defines (registry file only)
+        tk_vars = {
+            "mode": self.mode, "crop": self.crop, "pad_exact": self.pad_exact, "transparent_pad": self.transparent_pad,
+            "bg_hex": self.bg_color, "export_fmt": self.export_fmt, "quality": self.quality,
+            "png_profile": self.png_profile, "png_palette": self.png_palette,
+        }
+        for name, value in self.registry.settings.get(preset, {}).items():
+            tk_vars[name].set(value)
         self.log(f"Applied preset: {preset}")
 
     def add_custom_size(self):
@@ -415,15 +313,154 @@ class App(tk.Tk):
         label = f"{name} ({W}×{H})"
         key = f"custom_{name.lower().replace(' ', '_')}_{W}x{H}"
         self.custom_sizes[label] = (key, (W, H))
+        self.registry.sizes[label] = (key, (W, H))
         self.platform_vars[label] = tk.BooleanVar(value=True)
+        self.platform_vars[label].trace_add("write", self._schedule_preview)
         self._render_platform_checkboxes()
+        self._schedule_preview()
         self.custom_name.set(""); self.custom_w.set(""); self.custom_h.set("")
         self.log(f"Added custom size: {label}")
 
     def log(self, msg):
+        """Thread-safe: queue a log line; the Tk thread appends it on the next drain."""
+        self._events.put(("log", msg))
+
+    def _append_log(self, msg):
         self.log_text.insert("end", msg + "\n")
         self.log_text.see("end")
-        self.update_idletasks()
+
+    def _drain_events(self):
+        try:
+            while True:
+                kind, *payload = self._events.get_nowait()
+                if kind == "log":
+                    self._append_log(payload[0])
+                elif kind == "progress":
+                    self._show_progress(*payload)
+                elif kind == "finished":
+                    self._finish(*payload)
+                elif kind == "preview":
+                    self._show_preview(*payload)
+        except queue.Empty:
+            pass
+        self._drain_after = self.after(self.PREVIEW_POLL_MS if self._preview_pending else self.POLL_MS,
+                                       self._drain_events)
+
+    def _show_progress(self, done, total):
+        self.progress.configure(maximum=max(total, 1), value=done)
+        elapsed = time.monotonic() - self._started
+        if 0 < done < total:
+            eta = elapsed / done * (total - done)
+            self.eta_var.set(f"{done}/{total} · ETA {eta:.0f}s")
+        else:
+            self.eta_var.set(f"{done}/{total} · {elapsed:.1f}s")
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        self.run_btn.configure(state="disabled" if busy else "normal")
+        self.cancel_btn.configure(state="normal" if busy else "disabled")
+
+    def _export_job(self, plan, input_file):
+        """Runs on the worker thread; reports back only through the event queue."""
+        try:
+            plan.run(
+                input_file,
+                logger=self.log,
+                progress=lambda done, total: self._events.put(("progress", done, total)),
+                cancel=self._cancel,
+            )
+            self._events.put(("finished", "done", None))
+        except ExportCancelled as e:
+            self._events.put(("finished", "cancelled", str(e)))
+        except Exception as e:
+            self._events.put(("finished", "error", str(e)))
+
+    def _finish(self, status, detail):
+        self._set_busy(False)
+        if status == "done":
+            messagebox.showinfo("Done", "Export completed!")
+        elif status == "cancelled":
+            self._append_log(f"{detail}.")
+        else:
+            messagebox.showerror("Export error", detail)
+
+    def cancel(self):
+        if self._busy:
+            self._cancel.set()
+            self.log("Cancelling after the current size…")
+
+    # ---------- preview ----------
+    def _schedule_preview(self, *_):
+        """
+        The first change renders as soon as the current event is handled (so a
+        preset that sets many variables renders once); changes during the next
+        PREVIEW_BURST_MS are coalesced into one more render at its end.
+        """
+        self._preview_dirty = True
+        if self._preview_after is None:
+            self._preview_after = self.after_idle(self._preview_tick)
+
+    def _preview_tick(self):
+        if not self._preview_dirty:
+            self._preview_after = None
+            return
+        self._preview_dirty = False
+        self._start_preview()
+        self._preview_after = self.after(self.PREVIEW_BURST_MS, self._preview_tick)
+
+    def _start_preview(self):
+        self._preview_generation += 1
+        input_file = self.input_path.get().strip()
+        selection = [(lbl, size) for lbl, (_, size) in self.registry.sizes.items() if self.platform_vars[lbl].get()]
+        if not os.path.isfile(input_file) or not selection:
+            self._show_preview(self._preview_generation, [], None)
+            return
+        # Snapshot Tk variables here, as for exports
+        options = dict(
+            mode=self.mode.get(), crop=self.crop.get(), pad_exact=self.pad_exact.get(),
+            transparent_pad=self.transparent_pad.get(), bg_hex=self.bg_color.get(), export_fmt=self.export_fmt.get(),
+        )
+        self._preview_executor.submit(self._preview_job, self._preview_generation, input_file, selection, options)
+        if not self._preview_pending:  # pick the result up within PREVIEW_POLL_MS, not POLL_MS
+            self._preview_pending = True
+            self.after_cancel(self._drain_after)
+            self._drain_after = self.after(self.PREVIEW_POLL_MS, self._drain_events)
+
+    def _preview_job(self, generation, input_file, selection, options):
+        """Runs on the preview thread; only rendered images go back to the Tk thread."""
+        if generation != self._preview_generation:
+            return  # superseded while queued
+        try:
+            items = [(lbl, size, render_preview(input_file, size, **options)) for lbl, size in selection]
+            self._events.put(("preview", generation, items, None))
+        except Exception as e:
+            self._events.put(("preview", generation, [], f"{type(e).__name__}: {e}"))
+
+    def _show_preview(self, generation, items, error):
+        if generation != self._preview_generation:
+            return
+        self._preview_pending = False
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        self._preview_images = []
+        if error:
+            canvas.create_text(10, 10, anchor="nw", text=f"Preview unavailable: {error}")
+        x = 10
+        for lbl, (W, H), img in items:
+            photo = ImageTk.PhotoImage(img)
+            self._preview_images.append(photo)
+            cx = x + PREVIEW_SIDE // 2
+            canvas.create_image(cx, 6 + (PREVIEW_SIDE - img.height) // 2, anchor="n", image=photo)
+            canvas.create_text(cx, PREVIEW_SIDE + 10, anchor="n", width=PREVIEW_SIDE, justify="center",
+                               text=f"{lbl.split(' (')[0]}\n{W}×{H}")
+            x += PREVIEW_SIDE + 12
+        canvas.configure(scrollregion=(0, 0, x, PREVIEW_SIDE + 40))
+
+    def on_close(self):
+        self._cancel.set()
+        self._preview_executor.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False)
+        self.destroy()
 
     def run(self):
         input_file = self.input_path.get().strip()
@@ -438,41 +475,41 @@ class App(tk.Tk):
             messagebox.showwarning("Missing output folder", "Choose an output folder.")
             return
 
-        # Build selection from checked items (standard + custom)
-        selection = []
-        for lbl, var in self.platform_vars.items():
-            if not var.get():
-                continue
-            if lbl in SIZES:
-                selection.append((lbl, SIZES[lbl]))
-            elif lbl in self.custom_sizes:
-                selection.append((lbl, self.custom_sizes[lbl]))
+        # Build selection from checked items (standard + custom), in registry order
+        selection = [(lbl, size) for lbl, size in self.registry.sizes.items() if self.platform_vars[lbl].get()]
 
         if not selection:
             messagebox.showwarning("No platforms selected", "Select at least one platform.")
             return
 
         # Validate transparency choice vs export format
-        if self.transparent_pad.get() and self.export_fmt.get() == "JPEG" and self.mode.get() == "contain" and self.pad_exact.get():
-            self.log("Note: Transparent padding selected but JPEG has no alpha — letterbox color will be used for JPEG.")
+        if self.transparent_pad.get() and self.mode.get() == "contain" and self.pad_exact.get():
+            if "JPEG" in export_formats(self.export_fmt.get()):
+                self.log("Note: JPEG has no alpha — letterbox color will be used for the JPEG outputs.")
 
+        if self._busy:
+            return
         self.log("Processing…")
-        try:
-            resize_for_platforms(
-                input_file=input_file,
-                output_dir=output_dir,
-                selection=selection,
-                mode=self.mode.get(),
-                pad_exact=self.pad_exact.get(),
-                transparent_pad=self.transparent_pad.get(),
-                bg_hex=self.bg_color.get(),
-                export_fmt=self.export_fmt.get(),
-                quality=int(self.quality.get()),
-                logger=self.log
-            )
-            messagebox.showinfo("Done", "Export completed!")
-        except Exception as e:
-            messagebox.showerror("Export error", str(e))
+        # Snapshot Tk variables here: they must not be read from the worker thread.
+        plan = self.registry.compile(
+            output_dir,
+            selection=selection,
+            mode=self.mode.get(),
+            crop=self.crop.get(),
+            pad_exact=self.pad_exact.get(),
+            transparent_pad=self.transparent_pad.get(),
+            bg_hex=self.bg_color.get(),
+            export_fmt=self.export_fmt.get(),
+            quality=int(self.quality.get()),
+            png_profile=self.png_profile.get(),
+            png_palette=self.png_palette.get(),
+            threads=os.cpu_count() or 1,
+        )
+        self._cancel.clear()
+        self._started = time.monotonic()
+        self._show_progress(0, len(selection))
+        self._set_busy(True)
+        self._executor.submit(self._export_job, plan, input_file)
 
 def main():
     try:
@@ -0,0 +1,136 @@
+"""
+SocialResizer — pipelined file I/O.
+On slow or network storage, reading a source and writing its outputs can take
+as long as resizing. These helpers move both off the CPU path:
+
+- prefetch(): reads the next N sources into memory on background threads.
+- AsyncWriter: takes encoded outputs (bytes) and writes them on a small
+  thread pool, each to a temporary file that is renamed into place only once
+  complete, so readers never see a partial output. Queued bytes are bounded;
+  write() blocks when the limit is reached.
+
+resize_for_platforms accepts the prefetched bytes as `source=` and an
+AsyncWriter as `writer=`; run_batch wires both up with --prefetch/--writers.
+"""
+
+import os
+import stat
+import tempfile
+import threading
+from collections import deque
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+# Read once at import: os.umask() can only be queried by setting it, which
+# would race with files created on other threads later on.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def file_mode(path: str) -> int:
+    """
+    Permission bits a new file at path should get: those of the file it
+    replaces, else what open() would give under the umask (mkstemp's
+    temporary files are always 0600).
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+def atomic_write(path: str, data) -> None:
+    """
+    Write data to a temporary file next to path, then rename it over path.
+    The result has file_mode(path), like a file written in place.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def prefetch(paths, depth=4):
+    """
+    Yield (path, future of the file's bytes) in order while up to `depth`
+    upcoming files are already being read in the background.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=max(1, depth), thread_name_prefix="prefetch") as pool:
+        ahead = deque()
+        for path in paths:
+            ahead.append((path, pool.submit(read_file, path)))
+            if len(ahead) > depth:
+                yield ahead.popleft()
+        while ahead:
+            yield ahead.popleft()
+
+class AsyncWriter:
+    """
+    Bounded background writer with atomic rename-on-complete.
+    write() returns a Future; flush() waits for everything queued so far and
+    returns {path: error message} for the writes that failed.
+    """
+
+    def __init__(self, max_workers=4, max_pending_bytes=256 << 20):
+        from concurrent.futures import ThreadPoolExecutor  # not needed by atomic_write() alone
+        self.max_pending_bytes = max_pending_bytes
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="writer")
+        self._cond = threading.Condition()
+        self._pending_bytes = 0
+        self._futures = {}          # path -> Future of its latest write
+
+    def write(self, path: str, data, metrics=None, **fields):
+        """Queue data for path; blocks while more than max_pending_bytes are queued."""
+        size = len(data)
+        with self._cond:
+            # a single oversized output is still accepted once the queue is empty
+            while self._pending_bytes and self._pending_bytes + size > self.max_pending_bytes:
+                self._cond.wait()
+            self._pending_bytes += size
+        future = self._pool.submit(self._write, path, data, metrics, fields)
+        with self._cond:
+            self._futures[path] = future
+        return future
+
+    def _write(self, path, data, metrics, fields):
+        try:
+            if metrics is None:
+                atomic_write(path, data)
+            else:
+                with metrics.stage("write", path=path, bytes=len(data), **fields):
+                    atomic_write(path, data)
+        finally:
+            with self._cond:
+                self._pending_bytes -= len(data)
+                self._cond.notify_all()
+
+    def flush(self) -> dict:
+        with self._cond:
+            futures, self._futures = self._futures, {}
+        errors = {}
+        for path, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                errors[path] = f"{type(error).__name__}: {error}"
+        return errors
+
+    def close(self) -> dict:
+        errors = self.flush()
+        self._pool.shutdown(wait=True)
+        return errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,143 @@
+"""
+SocialResizer — per-stage timing and memory instrumentation.
+Pass a StageMetrics as `metrics=` to resize_for_platforms (or run_batch) to
+receive one event per pipeline stage: open, decode, convert, pyramid,
+resample, letterbox, flatten, encode and write. Each event carries its
+duration plus whatever the stage knows (source/target sizes, pixel counts,
+bytes written, path, format).
+
+Exporters:
+- JsonLinesExporter: one JSON object per event, streamed to a file.
+- write_prometheus_textfile: stage totals in the node_exporter textfile format.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes (None where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # KiB on Linux
+
+class StageMetrics:
+    """
+    Thread-safe collector of stage events.
+    Totals per stage are always kept; individual events are kept only when
+    keep_events=True (batch workers use that to ship events back to the parent).
+    Every event is also passed to each sink callable.
+    """
+
+    def __init__(self, sinks=(), keep_events=False):
+        self.sinks = list(sinks)
+        self.keep_events = keep_events
+        self.events = []
+        self.totals = {}            # stage -> {"count", "seconds", "bytes", "pixels"}
+        self.peak_rss = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        """Time the enclosed block; the yielded dict can be filled with extra fields."""
+        info = dict(fields)
+        t0 = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info["seconds"] = time.perf_counter() - t0
+            self.record(name, info)
+
+    def record(self, name, info):
+        event = {"ts": time.time(), "stage": name, "pid": os.getpid()}
+        event.update(info)
+        rss = peak_rss_bytes()
+        if rss is not None:
+            event["peak_rss"] = rss
+        self._add(event)
+
+    def replay(self, events, peak_rss=None):
+        """Merge events recorded elsewhere (e.g. in a worker process), keeping their ts/pid."""
+        for event in events:
+            self._add(dict(event))
+        if peak_rss is not None:
+            with self._lock:
+                self.peak_rss = max(self.peak_rss or 0, peak_rss)
+
+    def _add(self, event):
+        name = event["stage"]
+        with self._lock:
+            if event.get("peak_rss") is not None:
+                self.peak_rss = max(self.peak_rss or 0, event["peak_rss"])
+            total = self.totals.setdefault(name, {"count": 0, "seconds": 0.0, "bytes": 0, "pixels": 0})
+            total["count"] += 1
+            total["seconds"] += event.get("seconds", 0.0)
+            total["bytes"] += event.get("bytes", 0) if name == "write" else 0
+            total["pixels"] += event.get("pixels", 0)
+            if self.keep_events:
+                self.events.append(event)
+            for sink in self.sinks:
+                sink(event)
+
+    def summary(self):
+        """Human-readable per-stage totals, slowest first."""
+        lines = []
+        for name, t in sorted(self.totals.items(), key=lambda kv: -kv[1]["seconds"]):
+            extra = f"  {t['bytes'] / 1e6:.1f} MB" if t["bytes"] else ""
+            lines.append(f"{name:10} {t['count']:6}×  {t['seconds']:8.3f}s{extra}")
+        return "\n".join(lines)
+
+# ------------------------
+# Exporters
+# ------------------------
+class JsonLinesExporter:
+    """Sink that appends each event as one JSON line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=list, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def prometheus_text(metrics: StageMetrics, prefix: str = "socialresizer") -> str:
+    """Stage totals in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, kind, help_text, field):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for stage in sorted(metrics.totals):
+            lines.append(f'{prefix}_{name}{{stage="{stage}"}} {metrics.totals[stage][field]}')
+
+    family("stage_seconds_total", "counter", "Wall time spent per pipeline stage.", "seconds")
+    family("stage_events_total", "counter", "Number of times each stage ran.", "count")
+    family("stage_pixels_total", "counter", "Pixels processed per stage.", "pixels")
+    write = metrics.totals.get("write", {})
+    lines.append(f"# HELP {prefix}_bytes_written_total Bytes written to output files.")
+    lines.append(f"# TYPE {prefix}_bytes_written_total counter")
+    lines.append(f"{prefix}_bytes_written_total {write.get('bytes', 0)}")
+    if metrics.peak_rss is not None:
+        lines.append(f"# HELP {prefix}_peak_rss_bytes Peak resident set size of any worker.")
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {metrics.peak_rss}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_textfile(metrics: StageMetrics, path: str, prefix: str = "socialresizer"):
+    """Atomically write a .prom file for the node_exporter textfile collector."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(metrics, prefix))
+    os.replace(tmp, path)
@@ -0,0 +1,119 @@
+"""
+SocialResizer — fast previews from low-resolution proxies.
+A source is decoded once into a proxy (longest side PROXY_SIDE, JPEGs via
+draft mode) and every preview is rendered from it with the export's own
+geometry: cover_box/cover_resize (with the same smart-crop anchors),
+contain_size and letterbox_canvas. Previews are memoized per (source, size,
+options), so flipping a setting back and forth costs nothing and a change
+only re-renders from the proxy; the full-resolution source is only touched by
+an actual export.
+"""
+
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from social_resizer_core import (
+    FORMATS, contain_size, cover_resize, decode_source, export_formats, flatten_if_needed, hex_to_rgb,
+    letterbox_canvas, open_source,
+)
+from social_resizer_crop import CROP_METHODS, crop_anchors, source_id
+
+PROXY_SIDE = 512        # longest side of the decoded proxy (pixels)
+PREVIEW_SIDE = 160      # previews fit in a PREVIEW_SIDE square
+CHECKER = 8             # checkerboard square behind transparent pixels
+PROXY_MEMO = 4          # proxies kept (recent sources)
+PREVIEW_MEMO = 256      # rendered previews kept
+
+_proxies = OrderedDict()    # source id -> (proxy, full size)
+_previews = OrderedDict()   # (source id, size, options) -> image
+_lock = threading.Lock()
+
+def _remember(memo, key, value, limit):
+    with _lock:
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > limit:
+            memo.popitem(last=False)
+    return value
+
+def _recall(memo, key):
+    with _lock:
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key]
+    return None
+
+# ------------------------
+# Proxy
+# ------------------------
+def load_proxy(path: str):
+    """
+    (sRGB proxy with longest side <= PROXY_SIDE, full source size); RGBA for
+    sources with alpha. Memoized per file version.
+    """
+    source = source_id(path)
+    cached = _recall(_proxies, source) if source else None
+    if cached is not None:
+        return cached
+    with open_source(path) as img:
+        proxy, full_size = decode_source(img, [(PROXY_SIDE, PROXY_SIDE)], mode="contain", oversample=1)
+        proxy = proxy.copy() if proxy is img else proxy
+    proxy.thumbnail((PROXY_SIDE, PROXY_SIDE), Image.Resampling.BOX)
+    return _remember(_proxies, source, (proxy, full_size), PROXY_MEMO) if source else (proxy, full_size)
+
+def checkerboard(size, square=CHECKER) -> Image.Image:
+    """Light gray checkerboard, the usual backdrop for transparent pixels."""
+    board = Image.new("L", size, 255)
+    for y in range(0, size[1], square):
+        for x in range((y // square) % 2 * square, size[0], 2 * square):
+            board.paste(204, (x, y, x + square, y + square))
+    return board.convert("RGB")
+
+# ------------------------
+# Previews
+# ------------------------
+def preview_scale(W: int, H: int, side=PREVIEW_SIDE) -> float:
+    return min(1.0, side / max(W, H))
+
+def render_preview(path: str, size, mode="cover", crop="center", pad_exact=False, transparent_pad=False,
+                   bg_hex="#FFFFFF", export_fmt="JPEG", side=PREVIEW_SIDE) -> Image.Image:
+    """
+    RGB preview of one output size, scaled to fit a side×side square, laid out
+    exactly as the export would be (transparent pixels shown on a
+    checkerboard). Memoized per (source version, size, options).
+    """
+    W, H = size
+    # alpha survives only when some chosen format keeps it (as in the export)
+    keeps_alpha = any(FORMATS[fmt][1] for fmt in export_formats(export_fmt))
+    transparent = transparent_pad and keeps_alpha
+    padded = mode != "cover" and pad_exact
+    proxy, full_size = load_proxy(path)
+    source = source_id(path)
+    # only the options this layout uses, so e.g. a colour change in cover mode is a hit
+    uses_bg = (padded and not transparent) or (proxy.mode == "RGBA" and not keeps_alpha)
+    key = (source, (W, H), mode, crop if mode == "cover" else None, padded,
+           padded and transparent, keeps_alpha, bg_hex if uses_bg else None, side)
+    cached = _recall(_previews, key) if source else None
+    if cached is not None:
+        return cached
+    s = preview_scale(W, H, side)
+    w, h = max(1, round(W * s)), max(1, round(H * s))
+    if mode == "cover":
+        anchor = None
+        if CROP_METHODS.get(crop) is not None:
+            anchor = crop_anchors(proxy, full_size, [(W, H)], crop, source).get((W, H))
+        out = cover_resize(proxy, w, h, anchor)
+    else:
+        cw, ch = contain_size(*full_size, W, H)   # contain never upscales the full source
+        out = proxy.resize((max(1, round(cw * s)), max(1, round(ch * s))), Image.Resampling.LANCZOS)
+        if padded:
+            out = letterbox_canvas(out, w, h, transparent=transparent, bg_rgb=hex_to_rgb(bg_hex))
+    if out.mode == "RGBA" and keeps_alpha:
+        board = checkerboard(out.size)
+        board.paste(out, mask=out)
+        out = board
+    else:
+        out = flatten_if_needed(out, hex_to_rgb(bg_hex))
+    return _remember(_previews, key, out, PREVIEW_MEMO) if source else out
@@ -0,0 +1,449 @@
+"""
+SocialResizer — distributed job queue.
+A coordinator splits an input set into (source, plan) tasks and publishes
+them to a broker. Any number of stateless workers, on any number of hosts,
+claim tasks, run resize_for_platforms with the task's plan and acknowledge.
+Failed tasks are retried with exponential backoff and dead-lettered after
+the job's max attempts. A task whose worker dies is handed out again once its
+lease expires (workers renew leases while they work).
+
+The default broker is a SQLite database on a filesystem all hosts can reach
+(SQLiteBroker). Other brokers implement the same methods (publish, claim,
+heartbeat, ack, fail, requeue_dead, stats) and register in BROKERS.
+
+Every output is written to a temporary file and renamed into place, and a
+task always writes the same paths, so a task re-run after a crash replaces
+its outputs instead of duplicating or half-writing them. Sources and the
+output folder must be at the same paths on every worker host.
+
+Usage:
+    python social_resizer_queue.py submit photos/ -o /shared/out --preset "All Platforms" --broker /shared/queue.db
+    python social_resizer_queue.py work --broker /shared/queue.db -j 4      # on every worker host
+    python social_resizer_queue.py status --broker /shared/queue.db
+    python social_resizer_queue.py requeue --broker /shared/queue.db       # retry dead-lettered tasks
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from social_resizer_batch import add_export_arguments, collect_inputs, export_options, parse_bytes
+from social_resizer_io import AsyncWriter
+from social_resizer_registry import JobPlan, default_registry
+
+BROKER_ENV = "SOCIALRESIZER_BROKER"   # default broker for every subcommand
+LEASE_SECONDS = 60.0                  # a claimed task returns to the queue if not renewed within this
+MAX_ATTEMPTS = 3                      # attempts per task before it is dead-lettered
+RETRY_DELAY = 5.0                     # seconds before the first retry (doubles per attempt)
+POLL_INTERVAL = 1.0                   # idle workers look for new tasks this often
+
+@dataclass(frozen=True)
+class Task:
+    id: int
+    job: int
+    source: str
+    plan: JobPlan
+    attempt: int                      # 1 for the first try
+
+# ------------------------
+# SQLite broker
+# ------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    plan TEXT NOT NULL,
+    max_attempts INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job INTEGER NOT NULL REFERENCES jobs(id),
+    source TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',   -- pending, running, done, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,      -- retry backoff
+    lease_until REAL,
+    worker TEXT,
+    started REAL,
+    finished REAL,
+    outputs INTEGER,
+    error TEXT,
+    UNIQUE (job, source)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, not_before);
+"""
+
+class SQLiteBroker:
+    """
+    Task broker in one SQLite file. Claims run in an immediate transaction, so
+    concurrent workers (processes or hosts sharing the file) never get the
+    same task. On network filesystems use one whose locking SQLite supports.
+    """
+
+    def __init__(self, path: str, lease=LEASE_SECONDS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self._local = threading.local()   # one connection per thread
+        self._plans = {}                  # job id -> JobPlan
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _plan(self, job: int) -> JobPlan:
+        if job not in self._plans:
+            row = self._db().execute("SELECT plan FROM jobs WHERE id = ?", (job,)).fetchone()
+            self._plans[job] = JobPlan.from_dict(json.loads(row[0]))
+        return self._plans[job]
+
+    def publish(self, plan: JobPlan, sources, max_attempts=MAX_ATTEMPTS) -> int:
+        """Add a job with one task per source; returns the job id."""
+        with self._transaction() as db:
+            job = db.execute("INSERT INTO jobs (created, plan, max_attempts) VALUES (?, ?, ?)",
+                             (time.time(), json.dumps(plan.to_dict()), max_attempts)).lastrowid
+            db.executemany("INSERT OR IGNORE INTO tasks (job, source) VALUES (?, ?)",
+                           [(job, os.path.abspath(s)) for s in sources])
+        return job
+
+    def claim(self, worker: str):
+        """Next runnable task leased to worker, or None. Expired leases are reclaimed first."""
+        now = time.time()
+        with self._transaction() as db:
+            # a lease that ran out means its worker died: that attempt failed
+            db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= "
+                "(SELECT max_attempts FROM jobs WHERE jobs.id = tasks.job) THEN 'dead' ELSE 'pending' END, "
+                "error = 'lease expired (worker lost)', worker = NULL, not_before = ? "
+                "WHERE state = 'running' AND lease_until < ?", (now, now))
+            row = db.execute("SELECT id, job, source, attempts FROM tasks "
+                             "WHERE state = 'pending' AND not_before <= ? ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            task_id, job, source, attempts = row
+            db.execute("UPDATE tasks SET state = 'running', worker = ?, attempts = attempts + 1, "
+                       "lease_until = ?, started = ? WHERE id = ?", (worker, now + self.lease, now, task_id))
+        return Task(task_id, job, source, self._plan(job), attempts + 1)
+
+    def heartbeat(self, task: Task, worker: str) -> bool:
+        """Renew the lease; False if the task is no longer this worker's."""
+        with self._transaction() as db:
+            cur = db.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                             (time.time() + self.lease, task.id, worker))
+        return cur.rowcount == 1
+
+    def ack(self, task: Task, worker: str, outputs: int) -> bool:
+        """Mark done; False if the lease was lost (another worker owns the task now)."""
+        with self._transaction() as db:
+            cur = db.execute("UPDATE tasks SET state = 'done', finished = ?, outputs = ?, error = NULL, "
+                             "lease_until = NULL WHERE id = ? AND worker = ? AND state = 'running'",
+                             (time.time(), outputs, task.id, worker))
+        return cur.rowcount == 1
+
+    def fail(self, task: Task, worker: str, error: str) -> str:
+        """
+        Record a failed attempt; returns the task's new state ("pending" to
+        retry, or "dead"), or "lost" if the lease was lost (nothing recorded:
+        another worker owns the task now).
+        """
+        now = time.time()
+        with self._transaction() as db:
+            max_attempts = db.execute("SELECT max_attempts FROM jobs WHERE id = ?", (task.job,)).fetchone()[0]
+            state = "dead" if task.attempt >= max_attempts else "pending"
+            cur = db.execute("UPDATE tasks SET state = ?, error = ?, finished = ?, lease_until = NULL, "
+                             "not_before = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                             (state, error, now, now + self.retry_delay * 2 ** (task.attempt - 1), task.id, worker))
+        return state if cur.rowcount == 1 else "lost"
+
+    def requeue_dead(self, job=None) -> int:
+        """Give dead-lettered tasks (of one job, or all) a fresh set of attempts."""
+        with self._transaction() as db:
+            cur = db.execute("UPDATE tasks SET state = 'pending', attempts = 0, not_before = 0, worker = NULL "
+                             "WHERE state = 'dead' AND (? IS NULL OR job = ?)", (job, job))
+        return cur.rowcount
+
+    def backlog(self, job=None) -> int:
+        """Tasks not finished yet (pending, retrying or running)."""
+        scope, args = (" AND job = ?", (job,)) if job is not None else ("", ())
+        return self._db().execute(f"SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'running'){scope}",
+                                  args).fetchone()[0]
+
+    def stats(self, window=300.0, job=None) -> dict:
+        """Backlog, throughput over the last `window` seconds and dead letters."""
+        db = self._db()
+        now = time.time()
+        scope, args = (" AND job = ?", (job,)) if job is not None else ("", ())
+
+        def query(sql, *params):
+            return db.execute(sql.format(scope=scope), params + args).fetchall()
+
+        counts = dict.fromkeys(("pending", "running", "done", "dead"), 0)
+        counts.update(query("SELECT state, COUNT(*) FROM tasks WHERE 1{scope} GROUP BY state"))
+        done, outputs, avg, first, workers = query(
+            "SELECT COUNT(*), COALESCE(SUM(outputs), 0), AVG(finished - started), MIN(started), "
+            "COUNT(DISTINCT worker) FROM tasks WHERE state = 'done' AND finished >= ?{scope}", now - window)[0]
+        # rate over the part of the window the queue was actually busy
+        span = max(1.0, min(window, now - first)) if first else window
+        running = query("SELECT COUNT(DISTINCT worker) FROM tasks WHERE state = 'running'{scope}")[0][0]
+        retrying = query("SELECT COUNT(*) FROM tasks WHERE state = 'pending' AND attempts > 0{scope}")[0][0]
+        oldest = query("SELECT MIN(jobs.created) FROM tasks JOIN jobs ON jobs.id = tasks.job "
+                       "WHERE state = 'pending'{scope}")[0][0]
+        backlog = counts["pending"] + counts["running"]
+        return {
+            **counts,
+            "backlog": backlog,
+            "retrying": retrying,
+            "tasks_per_s": done / span,
+            "outputs_per_s": outputs / span,
+            "avg_task_s": avg,
+            "workers": max(workers, running),
+            "oldest_pending_s": now - oldest if oldest else None,
+            "eta_s": backlog * span / done if done else None,
+            "dead_letters": query("SELECT source, error FROM tasks WHERE state = 'dead'{scope} ORDER BY id LIMIT 20"),
+        }
+
+# broker name -> class; open_broker("sqlite:///path/queue.db") or a plain path
+BROKERS = {"sqlite": SQLiteBroker}
+
+def open_broker(url: str, **options):
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return SQLiteBroker(url, **options)
+    if scheme not in BROKERS:
+        raise ValueError(f"Unknown broker: {scheme}")
+    if os.name == "nt" and rest[2:3] == ":":
+        rest = rest[1:]  # sqlite:///C:/queue.db
+    return BROKERS[scheme](rest, **options)
+
+# ------------------------
+# Coordinator and workers
+# ------------------------
+def submit(broker, inputs, plan: JobPlan, max_attempts=MAX_ATTEMPTS) -> int:
+    """Publish one task per input file; returns the job id."""
+    return broker.publish(plan, inputs, max_attempts=max_attempts)
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def sweep_partials(task: Task, older_than: float):
+    """Remove temporary files a crashed attempt left next to this task's outputs."""
+    cutoff = time.time() - older_than
+    for _, _, _, path in task.plan.output_paths(task.source):
+        folder, name = os.path.split(path)
+        for tmp in glob.glob(os.path.join(glob.escape(folder), f".{glob.escape(name)}.*.tmp")):
+            with contextlib.suppress(OSError):
+                if os.path.getmtime(tmp) < cutoff:
+                    os.remove(tmp)
+
+def run_task(broker, task: Task, worker: str, logger=None, threads=None) -> bool:
+    """
+    Run one claimed task: outputs go through an AsyncWriter (temp file, then
+    rename) while a heartbeat keeps the lease. Returns True once acknowledged.
+    """
+    def log(msg):
+        (logger or print)(msg)
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(broker.lease / 3):
+            if not broker.heartbeat(task, worker):
+                return
+
+    if task.attempt > 1:
+        sweep_partials(task, older_than=broker.lease)
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    extra = {"threads": threads} if threads else {}
+    error = None
+    try:
+        with AsyncWriter(max_workers=2) as writer:
+            try:
+                saved = task.plan.run(task.source, logger=lambda msg: None, writer=writer, **extra)
+            finally:
+                failed = writer.flush()
+        if failed:
+            path, reason = next(iter(failed.items()))
+            error = f"Write failed: {path} ({reason})"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        beat.join()
+    if error is not None:
+        state = broker.fail(task, worker, error)
+        if state == "lost":
+            log(f"Lease lost: {task.source} (attempt {task.attempt} failed after another worker took it: {error})")
+        else:
+            log(f"{'Dead' if state == 'dead' else 'Retry'}: {task.source} (attempt {task.attempt}: {error})")
+        return False
+    if not broker.ack(task, worker, len(saved)):
+        log(f"Lease lost: {task.source} (another worker re-ran it)")
+        return False
+    log(f"Done: {task.source} ({len(saved)} outputs)")
+    return True
+
+def work(broker, max_tasks=None, exit_when_idle=False, threads=None, logger=None, stop=None) -> int:
+    """
+    Claim and run tasks until stopped, or with exit_when_idle until no task is
+    pending or running anywhere (retries and lost leases are waited for).
+    Returns the number of tasks this worker completed.
+    """
+    worker = worker_name()
+    done = 0
+    while (max_tasks is None or done < max_tasks) and not (stop is not None and stop.is_set()):
+        task = broker.claim(worker)
+        if task is None:
+            if exit_when_idle and not broker.backlog():
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        done += run_task(broker, task, worker, logger=logger, threads=threads)
+    return done
+
+def _work_process(url, lease, exit_when_idle, threads):
+    try:
+        work(open_broker(url, lease=lease), exit_when_idle=exit_when_idle, threads=threads)
+    except KeyboardInterrupt:
+        pass  # the lease of an unfinished task runs out and another worker takes it
+
+def format_stats(stats: dict) -> str:
+    def secs(value):
+        return "-" if value is None else f"{value:.0f}s"
+
+    lines = [
+        f"done {stats['done']}  running {stats['running']}  pending {stats['pending']} "
+        f"({stats['retrying']} retrying)  dead {stats['dead']}",
+        f"backlog {stats['backlog']} tasks  throughput {stats['tasks_per_s'] * 60:.1f} tasks/min "
+        f"({stats['outputs_per_s'] * 60:.1f} outputs/min)  workers {stats['workers']}",
+        f"avg task {secs(stats['avg_task_s'])}  oldest pending {secs(stats['oldest_pending_s'])}  "
+        f"ETA {secs(stats['eta_s'])}",
+    ]
+    lines += [f"dead: {source} ({error})" for source, error in stats["dead_letters"]]
+    return "\n".join(lines)
+
+# ------------------------
+# CLI
+# ------------------------
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--broker", default=os.environ.get(BROKER_ENV),
+                        help="Queue database path or URL, e.g. /shared/queue.db (default: $SOCIALRESIZER_BROKER)")
+    p = argparse.ArgumentParser(prog="social_resizer_queue",
+                                description="Spread resize jobs over many worker hosts through a shared queue.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("submit", parents=[common], help="Publish one task per source file")
+    s.add_argument("source", help="Image file, directory or glob pattern")
+    s.add_argument("-o", "--output", default="output", help="Output folder (same path on every worker)")
+    s.add_argument("-r", "--recursive", action="store_true", help="Recurse into subfolders")
+    s.add_argument("-p", "--preset", action="append", default=[], help="Preset name (repeatable)")
+    s.add_argument("-s", "--size", action="append", default=[], help="Size label or key (repeatable)")
+    add_export_arguments(s)
+    s.add_argument("--strict", action="store_true",
+                   help="Resample every cover size from the source (never derive one size from another)")
+    s.add_argument("--memory-budget", metavar="SIZE", help="Peak memory per task, e.g. 1G")
+    s.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Attempts before a task is dead-lettered")
+
+    w = sub.add_parser("work", parents=[common], help="Run tasks from the queue")
+    w.add_argument("-j", "--workers", type=int, default=1, help="Worker processes on this host")
+    w.add_argument("--threads", type=int, default=None, help="Threads per image (default: the job's setting)")
+    w.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Seconds before a silent worker's task is reclaimed")
+    w.add_argument("--exit-when-idle", action="store_true", help="Stop once the queue is drained")
+
+    st = sub.add_parser("status", parents=[common], help="Backlog, throughput and dead letters")
+    st.add_argument("--job", type=int, default=None, help="Only this job")
+    st.add_argument("--window", type=float, default=300.0, help="Throughput window in seconds")
+    st.add_argument("--json", action="store_true", help="Print the raw numbers as JSON")
+
+    r = sub.add_parser("requeue", parents=[common], help="Retry dead-lettered tasks")
+    r.add_argument("--job", type=int, default=None, help="Only this job")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.broker:
+        sys.stderr.write("Missing --broker (or $SOCIALRESIZER_BROKER).\n")
+        return 2
+    try:
+        broker = open_broker(args.broker, **({"lease": args.lease} if args.command == "work" else {}))
+    except (sqlite3.Error, ValueError) as e:
+        sys.stderr.write(f"Broker: {e}\n")
+        return 2
+
+    if args.command == "submit":
+        try:
+            plan = default_registry(args.registry).compile(
+                os.path.abspath(args.output), args.preset, args.size, **export_options(args),
+                strict=args.strict, memory_budget=parse_bytes(args.memory_budget) if args.memory_budget else None,
+            )
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"{e}\n")
+            return 2
+        if not plan.selection:
+            sys.stderr.write("Select at least one size with --preset or --size.\n")
+            return 2
+        files = collect_inputs(args.source, recursive=args.recursive)
+        if not files:
+            sys.stderr.write(f"No images found: {args.source}\n")
+            return 2
+        job = submit(broker, files, plan, max_attempts=args.max_attempts)
+        print(f"Job {job}: {len(files)} tasks queued")
+        return 0
+
+    if args.command == "work":
+        if args.workers <= 1:
+            try:
+                work(broker, exit_when_idle=args.exit_when_idle, threads=args.threads)
+            except KeyboardInterrupt:
+                pass
+            return 0
+        procs = [multiprocessing.Process(target=_work_process,
+                                         args=(args.broker, args.lease, args.exit_when_idle, args.threads))
+                 for _ in range(args.workers)]
+        for proc in procs:
+            proc.start()
+        try:
+            for proc in procs:
+                proc.join()
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.join()
+        return 0
+
+    if args.command == "status":
+        stats = broker.stats(window=args.window, job=args.job)
+        print(json.dumps(stats) if args.json else format_stats(stats))
+        return 0
+
+    if args.command == "requeue":
+        print(f"Requeued {broker.requeue_dead(args.job)} dead-lettered tasks")
+        return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+SocialResizer — size/preset registry and compiled job plans.
+The built-in SIZES and PRESETS can be extended or replaced by a JSON or TOML
+file that defines sizes, presets and per-preset export settings:
+
+    [sizes.shop_square]
+    label = "Shop Square (2048×2048)"
+    width = 2048
+    height = 2048
+
+    [presets."Shop"]
+    sizes = ["shop_square", "instagram_post"]     # size keys or labels
+    export = { mode = "contain", pad = true, format = "JPEG", quality = 90, background = "#F4F4F4" }
+    # cover presets can also set crop = "faces" (see social_resizer_crop)
+
+(JSON: the same structure as an object.) A top-level `replace = true` drops
+the built-ins. Registry.compile() turns a selection plus settings into an
+immutable JobPlan that batch, watch and the GUI reuse for every file.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from social_resizer_core import (
+    PNG_PROFILES, PRESETS, SIZES, cache_params, export_exts, export_formats, hex_to_rgb,
+    output_filename, resize_for_platforms, resolve_output_dir, sanitize_basename,
+)
+from social_resizer_crop import CROP_METHODS
+
+REGISTRY_ENV = "SOCIALRESIZER_REGISTRY"   # default registry file for every front end
+
+# registry setting -> (resize_for_platforms keyword, validator)
+EXPORT_SETTINGS = {
+    "mode": ("mode", lambda v: v in ("cover", "contain")),
+    "crop": ("crop", lambda v: v in CROP_METHODS),
+    "pad": ("pad_exact", lambda v: isinstance(v, bool)),
+    "transparent": ("transparent_pad", lambda v: isinstance(v, bool)),
+    "background": ("bg_hex", lambda v: isinstance(v, str)),
+    "format": ("export_fmt", lambda v: _valid_formats(v)),
+    "quality": ("quality", lambda v: isinstance(v, int) and 1 <= v <= 100),
+    "png_profile": ("png_profile", lambda v: v in PNG_PROFILES),
+    "png_palette": ("png_palette", lambda v: isinstance(v, bool)),
+}
+
+def _valid_formats(value) -> bool:
+    try:
+        export_formats(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+class Registry:
+    """
+    Sizes ({label: (key, (W,H))}, same shape as SIZES), presets ({name: [labels]})
+    and per-preset export settings ({name: {resize_for_platforms keyword: value}}).
+    """
+
+    def __init__(self, sizes=None, presets=None, settings=None):
+        self.sizes = dict(SIZES if sizes is None else sizes)
+        self.presets = {name: list(labels) for name, labels in (PRESETS if presets is None else presets).items()}
+        self.settings = dict(settings or {})
+
+    def label_for(self, name: str) -> str:
+        """Size label from a label or a size key."""
+        if name in self.sizes:
+            return name
+        for label, (key, _) in self.sizes.items():
+            if key == name:
+                return label
+        raise ValueError(f"Unknown size: {name}")
+
+    def resolve_selection(self, presets=(), sizes=()):
+        """
+        Build a selection list (label, (key, (W,H))) from preset names and size
+        labels/keys, keeping registry order and dropping duplicates.
+        """
+        wanted = set()
+        for preset in presets:
+            if preset not in self.presets:
+                raise ValueError(f"Unknown preset: {preset}")
+            wanted.update(self.presets[preset])
+        wanted.update(self.label_for(s) for s in sizes)
+        return [(label, self.sizes[label]) for label in self.sizes if label in wanted]
+
+    def settings_for(self, presets=()) -> dict:
+        """Export settings of the given presets merged; conflicting values raise ValueError."""
+        merged = {}
+        for preset in presets:
+            for name, value in self.settings.get(preset, {}).items():
+                if merged.get(name, value) != value:
+                    raise ValueError(f"Presets disagree on {name}: {merged[name]!r} vs {value!r}")
+                merged[name] = value
+        return merged
+
+    def compile(self, output_dir, presets=(), sizes=(), selection=None, **options):
+        """
+        JobPlan for the given presets/sizes (or an explicit selection). Preset
+        export settings apply unless overridden by an explicit keyword.
+        """
+        if selection is None:
+            selection = self.resolve_selection(presets, sizes)
+        merged = self.settings_for(presets)
+        merged.update({k: v for k, v in options.items() if v is not None})
+        return JobPlan.build(output_dir, selection, merged)
+
+    # ---------- loading ----------
+    def update_from(self, data: dict, source="registry"):
+        """Merge a parsed registry document into this registry."""
+        if data.get("replace"):
+            self.sizes, self.presets, self.settings = {}, {}, {}
+        for key, spec in data.get("sizes", {}).items():
+            try:
+                W, H = int(spec["width"]), int(spec["height"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{source}: size {key} needs integer width and height") from None
+            if W <= 0 or H <= 0:
+                raise ValueError(f"{source}: size {key} must be positive")
+            label = spec.get("label") or f"{key} ({W}×{H})"
+            for old, (old_key, _) in list(self.sizes.items()):
+                if old_key == key:
+                    del self.sizes[old]  # redefined: keep one entry per key
+            self.sizes[label] = (key, (W, H))
+        for name, spec in data.get("presets", {}).items():
+            labels = spec if isinstance(spec, list) else spec.get("sizes", [])
+            try:
+                self.presets[name] = [self.label_for(s) for s in labels]
+            except ValueError as e:
+                raise ValueError(f"{source}: preset {name}: {e}") from None
+            export = {} if isinstance(spec, list) else spec.get("export", {})
+            self.settings[name] = _export_options(export, f"{source}: preset {name}")
+        return self
+
+def _export_options(export: dict, where: str) -> dict:
+    options = {}
+    for name, value in export.items():
+        if name not in EXPORT_SETTINGS:
+            raise ValueError(f"{where}: unknown export setting {name}")
+        keyword, valid = EXPORT_SETTINGS[name]
+        if not valid(value):
+            raise ValueError(f"{where}: invalid {name}: {value!r}")
+        options[keyword] = value
+    return options
+
+def load_registry(path: str, base: Registry = None) -> Registry:
+    """Registry from a .json or .toml file, layered over `base` (default: built-ins)."""
+    if path.lower().endswith(".toml"):
+        try:
+            import tomllib  # Python 3.11+; only loaded for TOML registries
+        except ImportError:
+            raise ValueError("TOML registries need Python 3.11+ (use JSON instead)") from None
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    return (base or Registry()).update_from(data, source=os.path.basename(path))
+
+def default_registry(path=None) -> Registry:
+    """Registry from `path`, else from $SOCIALRESIZER_REGISTRY, else the built-ins."""
+    path = path or os.environ.get(REGISTRY_ENV)
+    return load_registry(path) if path else Registry()
+
+# ------------------------
+# Compiled job plans
+# ------------------------
+@dataclass(frozen=True)
+class JobPlan:
+    """
+    Everything about an export that does not depend on the source file:
+    resolved sizes, crop/pad rules, output folder and filename suffixes, and
+    the resize_for_platforms keywords. Immutable and picklable, so one plan is
+    built per run and shared by every file and worker.
+    """
+    output_dir: str             # resolved (reserved device names already handled)
+    selection: tuple            # ((label, (key, (W,H))), ...)
+    outputs: tuple              # ((key, (W,H), ext), ...) in output order
+    options: MappingProxyType   # resize_for_platforms keywords (mode, export_fmt, ...)
+    bg_rgb: tuple               # parsed background colour
+
+    @classmethod
+    def build(cls, output_dir, selection, options):
+        options = dict(options)
+        exts = export_exts(options.get("export_fmt", "JPEG"))
+        if options.get("png_profile", "smallest") not in PNG_PROFILES:
+            raise ValueError(f"Unknown PNG profile: {options['png_profile']}")
+        selection = tuple((label, (key, tuple(size))) for label, (key, size) in selection)
+        outputs = tuple((key, size, ext) for _, (key, size) in selection for _, ext in exts)
+        return cls(resolve_output_dir(output_dir), selection, outputs,
+                   MappingProxyType(options), hex_to_rgb(options.get("bg_hex", "#FFFFFF")))
+
+    def __reduce__(self):  # mappingproxy does not pickle
+        return (JobPlan.build, (self.output_dir, self.selection, dict(self.options)))
+
+    def to_dict(self) -> dict:
+        """JSON-ready form (e.g. for a job queue); JobPlan.from_dict() restores it."""
+        return {"output_dir": self.output_dir, "selection": self.selection, "options": dict(self.options)}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls.build(data["output_dir"], data["selection"], data["options"])
+
+    @property
+    def targets(self):
+        return [size for _, (_, size) in self.selection]
+
+    def output_paths(self, input_file):
+        """Same result as social_resizer_core.output_paths for this plan."""
+        base = sanitize_basename(os.path.splitext(os.path.basename(input_file))[0])
+        return [(key, size, ext, os.path.join(self.output_dir, output_filename(base, key, ext)))
+                for key, size, ext in self.outputs]
+
+    def cache_params(self) -> dict:
+        return cache_params(**self.options)
+
+    def run(self, input_file, **extra):
+        """resize_for_platforms for one source with this plan's settings."""
+        return resize_for_platforms(input_file, self.output_dir, list(self.selection),
+                                    **dict(self.options, **extra))
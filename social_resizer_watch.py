@@ -0,0 +1,333 @@
+"""
+SocialResizer — watch-folder daemon.
+Continuously ingests images dropped into one or more folders, each bound to a
+preset from PRESETS. New files are picked up via filesystem notifications
+(the optional `watchdog` package) or by polling, processed once their size and
+mtime have stopped changing, and pushed through a bounded queue to a fixed
+pool of worker threads. When the queue is full the watcher blocks, so memory
+stays flat under bursts.
+
+Usage:
+    python social_resizer_watch.py --watch "drop/instagram=Instagram – All" \\
+        --watch "drop/linkedin=LinkedIn Ads" -o ready --workers 4
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from social_resizer_batch import IMAGE_EXTS, add_export_arguments, export_options, parse_bytes
+from social_resizer_cache import OutputCache
+from social_resizer_registry import JobPlan, Registry, default_registry
+
+try:  # optional: native change notifications (inotify / FSEvents / ReadDirectoryChangesW)
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+@dataclass(frozen=True)
+class WatchTarget:
+    folder: str
+    preset: str
+    plan: JobPlan
+
+    @property
+    def output_dir(self):
+        return self.plan.output_dir
+
+def parse_watch_spec(spec: str, output_root: str, registry: Registry = None, **options) -> WatchTarget:
+    """
+    'FOLDER=PRESET' -> WatchTarget writing to <output_root>/<folder name>, with
+    the preset's export settings unless overridden by `options`.
+    """
+    folder, sep, preset = spec.rpartition("=")
+    if not sep or not folder:
+        raise ValueError(f"Expected FOLDER=PRESET, got: {spec}")
+    folder = os.path.abspath(folder)
+    output_dir = os.path.join(os.path.abspath(output_root), os.path.basename(folder))
+    plan = (registry or Registry()).compile(output_dir, [preset], **options)
+    if not plan.selection:
+        raise ValueError(f"Preset has no sizes: {preset}")
+    return WatchTarget(folder, preset, plan)
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher, target):
+        self.watcher = watcher
+        self.target = target
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path, self.target)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path, self.target)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.dest_path, self.target)
+
+class FolderWatcher:
+    """
+    Watch folders and feed settled files to worker threads.
+
+    A file is considered complete once its (size, mtime) has been unchanged
+    for `settle` seconds and it can be opened for reading. Each (path, size,
+    mtime) is processed once; with use_cache=True a per-output-folder
+    OutputCache also skips files already rendered before a restart. Files
+    that leave a folder are forgotten at the next scan and their manifest
+    entries at the next prune, so a long-running daemon's state follows what
+    is in the folders rather than everything it has ever seen.
+    """
+
+    SAVE_INTERVAL = 5.0     # seconds between cache manifest writes
+    RESCAN_INTERVAL = 60.0  # safety rescan when relying on notifications (missed events)
+    PRUNE_INTERVAL = 300.0  # seconds between dropping manifest entries of removed sources/outputs
+
+    def __init__(self, targets, workers=2, queue_size=32, settle=2.0, poll_interval=1.0,
+                 use_polling=None, use_cache=True, process_existing=False, logger=None, **options):
+        self.targets = list(targets)
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_polling = Observer is None if use_polling is None else use_polling
+        self.process_existing = process_existing
+        self.options = options              # resize_for_platforms keywords overriding every plan
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.caches = {t.output_dir: OutputCache.for_output_dir(t.output_dir) for t in self.targets} if use_cache else {}
+        self._pending = {}                  # path -> (target, size, mtime_ns, last change)
+        self._seen = {}                     # path -> (size, mtime_ns) already queued
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+        self.processed = 0
+        self.failed = 0
+
+    def log(self, msg):
+        (self.logger or print)(msg)
+
+    # ---------- discovery ----------
+    def touch(self, path, target):
+        """Note a (possibly still growing) file; it is queued once it settles."""
+        if not path.lower().endswith(IMAGE_EXTS) or os.path.basename(path).startswith("."):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        sig = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._seen.get(path) == sig:
+                return
+            prev = self._pending.get(path)
+            if prev is None or (prev[1], prev[2]) != sig:
+                self._pending[path] = (target, st.st_size, st.st_mtime_ns, time.monotonic())
+
+    def scan(self, target):
+        try:
+            entries = list(os.scandir(target.folder))
+        except OSError:
+            return
+        present = set()
+        for entry in entries:
+            if entry.is_file():
+                present.add(entry.path)
+                self.touch(entry.path, target)
+        self._forget(target.folder, present)
+
+    def _forget(self, folder, present):
+        """Drop seen-file entries for files no longer in folder."""
+        with self._lock:
+            for path in [p for p in self._seen if p not in present and os.path.dirname(p) == folder]:
+                del self._seen[path]
+
+    def _settled(self):
+        """Pop files whose size/mtime did not change for `settle` seconds."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (target, size, mtime_ns, changed) in list(self._pending.items()):
+                if now - changed < self.settle:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._pending[path]     # vanished before it settled
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    self._pending[path] = (target, st.st_size, st.st_mtime_ns, now)
+                    continue
+                if size == 0 or not _readable(path):
+                    continue
+                del self._pending[path]
+                self._seen[path] = (size, mtime_ns)
+                ready.append((path, target))
+        return ready
+
+    # ---------- workers ----------
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            path, target = item
+            try:
+                self._process(path, target)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, path, target):
+        cache = self.caches.get(target.output_dir)
+        t0 = time.monotonic()
+        try:
+            saved = target.plan.run(path, logger=lambda msg: None, cache=cache, **self.options)
+            with self._lock:
+                self.processed += 1
+            self.log(f"Ready: {os.path.basename(path)} -> {len(saved)} outputs "
+                     f"[{target.preset}] in {time.monotonic() - t0:.1f}s")
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            self.log(f"Failed: {path} ({type(e).__name__}: {e})")
+
+    # ---------- lifecycle ----------
+    def start(self):
+        for target in self.targets:
+            os.makedirs(target.folder, exist_ok=True)
+            os.makedirs(target.output_dir, exist_ok=True)
+            if self.process_existing:
+                self.scan(target)
+            else:
+                for entry in os.scandir(target.folder):
+                    if entry.is_file():
+                        st = entry.stat()
+                        self._seen[entry.path] = (st.st_size, st.st_mtime_ns)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"watch-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if not self.use_polling:
+            self._observer = Observer()
+            for target in self.targets:
+                self._observer.schedule(_EventHandler(self, target), target.folder, recursive=False)
+            self._observer.start()
+        how = "polling" if self.use_polling else "notifications"
+        for target in self.targets:
+            self.log(f"Watching {target.folder} [{target.preset}] -> {target.output_dir} ({how})")
+
+    def run_forever(self):
+        """Dispatch loop: poll (if needed), queue settled files, block when the queue is full."""
+        self.start()
+        last_poll = last_save = last_prune = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                interval = self.poll_interval if self.use_polling else self.RESCAN_INTERVAL
+                if now - last_poll >= interval:
+                    for target in self.targets:
+                        self.scan(target)
+                    last_poll = now
+                if now - last_prune >= self.PRUNE_INTERVAL:
+                    self._prune_caches()
+                    last_prune = now
+                if now - last_save >= self.SAVE_INTERVAL:
+                    self._save_caches()
+                    last_save = now
+                for item in self._settled():
+                    self.queue.put(item)        # blocks while workers are saturated
+                self._stop.wait(min(0.25, self.settle / 2 or 0.25))
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        """Stop watching, let workers finish the queued files, then return."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self._save_caches()
+
+    def _save_caches(self):
+        for cache in self.caches.values():
+            cache.save()
+
+    def _prune_caches(self):
+        for output_dir, cache in self.caches.items():
+            dropped = cache.prune()
+            if dropped:
+                self.log(f"Pruned {dropped} cache entries in {output_dir}")
+
+def _readable(path):
+    """True when the file can be opened for reading (Windows locks files being written)."""
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+# ------------------------
+# CLI
+# ------------------------
+def build_parser():
+    p = argparse.ArgumentParser(prog="social_resizer_watch", description="Watch drop folders and resize new images.")
+    p.add_argument("--watch", action="append", required=True, metavar="FOLDER=PRESET",
+                   help="Folder to watch and the preset applied to it (repeatable)")
+    p.add_argument("-o", "--output", default="output", help="Output root (one subfolder per watched folder)")
+    add_export_arguments(p)
+    p.add_argument("--strict", action="store_true",
+                   help="Resample every cover size from the source (never derive one size from another)")
+    p.add_argument("-j", "--workers", type=int, default=2, help="Worker threads")
+    p.add_argument("--memory-budget", metavar="SIZE",
+                   help="Peak image memory for the whole daemon, e.g. 2G (split across workers)")
+    p.add_argument("--queue-size", type=int, default=32, help="Max files waiting for a worker")
+    p.add_argument("--settle", type=float, default=2.0, help="Seconds a file must stay unchanged")
+    p.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed")
+    p.add_argument("--poll-interval", type=float, default=1.0)
+    p.add_argument("--existing", action="store_true", help="Also process files already in the folders")
+    p.add_argument("--no-cache", action="store_true", help="Do not keep an output cache manifest")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        registry = default_registry(args.registry)
+        memory_budget = parse_bytes(args.memory_budget) // max(1, args.workers) if args.memory_budget else None
+        targets = [
+            parse_watch_spec(spec, args.output, registry, **export_options(args),
+                             memory_budget=memory_budget, strict=args.strict)
+            for spec in args.watch
+        ]
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"{e}\n")
+        return 2
+    watcher = FolderWatcher(
+        targets, workers=args.workers, queue_size=args.queue_size, settle=args.settle,
+        poll_interval=args.poll_interval, use_polling=True if args.poll else None,
+        use_cache=not args.no_cache, process_existing=args.existing,
+    )
+    try:
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stopped: {watcher.processed} processed, {watcher.failed} failed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
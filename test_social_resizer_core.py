@@ -0,0 +1,45 @@
+"""
+Memory-budget planning: estimates must cover what Pillow really decodes.
+"""
+
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from social_resizer_core import (
+    SIZES, MemoryBudgetExceeded, decode_source, image_bytes, open_source, plan_memory,
+)
+
+MIB = 1 << 20
+
+def png_header(path, w, h):
+    """A PNG with only its header: Image.open() sees a w×h RGB image without allocating it."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IEND", b""))
+
+def test_large_png_must_fit_its_full_decode(tmp_path):
+    # 9000×6000 RGB decodes to ~206 MiB before reduce() can shrink it
+    png_header(tmp_path / "big.png", 9000, 6000)
+    targets = [SIZES["Instagram Post (1080×1080)"][1]]
+    with open_source(str(tmp_path / "big.png")) as img:
+        with pytest.raises(MemoryBudgetExceeded):
+            plan_memory(img, targets, factor=3, budget=64 * MIB)
+        with pytest.raises(MemoryBudgetExceeded):
+            decode_source(img, targets, memory_budget=64 * MIB)
+        plan = plan_memory(img, targets, factor=3, budget=1024 * MIB)
+    assert plan.peak >= image_bytes((9000, 6000), "RGB")
+
+def test_jpeg_is_costed_at_the_dct_scale_draft_uses(tmp_path):
+    Image.new("RGB", (3000, 2000), (90, 120, 150)).save(tmp_path / "a.jpg")
+    targets = [(640, 360)]
+    with open_source(str(tmp_path / "a.jpg")) as img:
+        # draft() would decode a factor of 3 at 1/2 (1500×1000), which does not fit 8 MiB
+        plan = plan_memory(img, targets, factor=3, budget=8 * MIB)
+        assert plan.decode_factor == 4
+        src, _ = decode_source(img, targets, memory_budget=8 * MIB)
+    assert src.size == (750, 500)
+    assert image_bytes(src.size, "RGB") <= plan.peak <= 8 * MIB
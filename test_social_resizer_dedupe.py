@@ -0,0 +1,60 @@
+"""
+Regression tests: outputs shared with a duplicate through a hard link must not
+change when the duplicate later becomes a different image and is rendered,
+and outputs written via rename (or copied) keep ordinary permissions.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+from PIL import Image
+
+import social_resizer_batch
+import social_resizer_io
+from social_resizer_core import PRESETS, SIZES, resize_for_platforms
+from social_resizer_dedupe import link_output
+
+def run(src, out):
+    argv = [str(src), "-o", str(out), "--size", "instagram_post", "--dedupe", "--cache", "-j", "1"]
+    assert social_resizer_batch.main(argv) == 0
+
+def center(path):
+    with Image.open(path) as img:
+        return img.convert("RGB").getpixel((img.width // 2, img.height // 2))
+
+def test_rerender_after_dedupe_leaves_original_outputs_alone(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    Image.new("RGB", (800, 600), (200, 30, 30)).save(src / "a.jpg", quality=95)
+    (src / "b.jpg").write_bytes((src / "a.jpg").read_bytes())
+    run(src, out)
+    a_out, b_out = out / "a_instagram_post.jpg", out / "b_instagram_post.jpg"
+    assert os.path.samefile(a_out, b_out)       # b reused a's output (hard link)
+
+    Image.new("RGB", (800, 600), (30, 30, 200)).save(src / "b.jpg", quality=95)
+    run(src, out)
+    assert not os.path.samefile(a_out, b_out)
+    r, g, b = center(a_out)
+    assert r > 150 and b < 80                   # a is still red ...
+    r, g, b = center(b_out)
+    assert b > 150 and r < 80                   # ... and b is now blue
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+def test_rendered_outputs_are_not_private(tmp_path, monkeypatch):
+    # outputs are written through a temporary file and renamed, never rewritten in place
+    monkeypatch.setattr(social_resizer_io, "_UMASK", 0o022)
+    Image.new("RGB", (800, 600), (200, 30, 30)).save(tmp_path / "a.jpg")
+    selection = [(label, SIZES[label]) for label in PRESETS["LinkedIn Ads"]]
+    saved = resize_for_platforms(str(tmp_path / "a.jpg"), str(tmp_path / "out"), selection,
+                                 export_fmt="JPEG+PNG", threads=2, logger=lambda msg: None)
+    assert saved and all(stat.S_IMODE(os.stat(p).st_mode) == 0o644 for p in saved)
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+def test_copied_outputs_keep_the_original_mode(tmp_path):
+    src = tmp_path / "a_instagram_post.jpg"
+    src.write_bytes(b"jpeg")
+    os.chmod(src, 0o644)
+    assert link_output(str(src), str(tmp_path / "b_instagram_post.jpg"), "copy") == "copy"
+    assert stat.S_IMODE(os.stat(tmp_path / "b_instagram_post.jpg").st_mode) == 0o644
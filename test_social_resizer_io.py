@@ -0,0 +1,40 @@
+"""
+Outputs written through a temporary file get the permissions a file written
+in place would have, not mkstemp's 0600.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+import social_resizer_io
+from social_resizer_io import AsyncWriter, atomic_write
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_new_file_follows_umask(tmp_path, monkeypatch):
+    monkeypatch.setattr(social_resizer_io, "_UMASK", 0o022)
+    atomic_write(str(tmp_path / "a.jpg"), b"data")
+    assert mode(tmp_path / "a.jpg") == 0o644
+    monkeypatch.setattr(social_resizer_io, "_UMASK", 0o077)
+    atomic_write(str(tmp_path / "b.jpg"), b"data")
+    assert mode(tmp_path / "b.jpg") == 0o600
+
+def test_replaced_file_keeps_its_mode(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"old")
+    os.chmod(path, 0o640)
+    atomic_write(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert mode(path) == 0o640
+
+def test_async_writer_outputs_are_not_private(tmp_path, monkeypatch):
+    monkeypatch.setattr(social_resizer_io, "_UMASK", 0o022)
+    with AsyncWriter(max_workers=2) as writer:
+        writer.write(str(tmp_path / "a.png"), b"data").result()
+    assert mode(tmp_path / "a.png") == 0o644
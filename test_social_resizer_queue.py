@@ -0,0 +1,38 @@
+"""
+SQLite broker: a worker whose lease ran out must not record results for a
+task that another worker has claimed since.
+"""
+
+import time
+
+from social_resizer_core import SIZES
+from social_resizer_queue import SQLiteBroker, run_task
+from social_resizer_registry import JobPlan
+
+def expired_task(tmp_path):
+    """(broker, the first worker's task, the second worker's task) after the first lease expired."""
+    broker = SQLiteBroker(str(tmp_path / "queue.db"), lease=0.05, retry_delay=0)
+    label = "Instagram Post (1080×1080)"
+    plan = JobPlan.build(str(tmp_path / "out"), [(label, SIZES[label])], {})
+    broker.publish(plan, [str(tmp_path / "missing.jpg")])
+    first = broker.claim("w1")
+    time.sleep(0.1)
+    second = broker.claim("w2")         # reclaims the expired lease
+    assert second is not None and second.id == first.id
+    return broker, first, second
+
+def state(broker, task):
+    return broker._db().execute("SELECT state, worker FROM tasks WHERE id = ?", (task.id,)).fetchone()
+
+def test_fail_after_lease_expired_is_lost(tmp_path):
+    broker, first, second = expired_task(tmp_path)
+    assert broker.fail(first, "w1", "boom") == "lost"
+    assert state(broker, second) == ("running", "w2")
+    assert broker.fail(second, "w2", "boom") == "pending"
+
+def test_run_task_reports_lost_lease(tmp_path):
+    broker, first, second = expired_task(tmp_path)
+    logs = []
+    assert run_task(broker, first, "w1", logger=logs.append) is False
+    assert logs and logs[-1].startswith("Lease lost:")
+    assert state(broker, second) == ("running", "w2")